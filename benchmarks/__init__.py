@@ -0,0 +1,6 @@
+import os
+
+# Settings are read at import time, so this runs before configs.settings is loaded.
+# Every ASGITransport request comes from the same address: with login throttling on,
+# the scenarios would mostly measure 429s (and setup logins would fail).
+os.environ['LOGIN_THROTTLE_STORE'] = 'off'
@@ -0,0 +1,81 @@
+# Micro-benchmarks:  python -m benchmarks micro --output micro.json
+# End-to-end:        MONGO_URI=mongodb://localhost:27017 python -m benchmarks scenarios --db d_money_flow_bench
+# Compare releases:  python -m benchmarks compare old.json new.json
+import argparse
+import json
+import os
+import platform
+import sys
+from pathlib import Path
+
+from benchmarks.harness import BENCH_DB_SUFFIX, BenchmarkResult, print_results
+
+COMPARE_FIELDS = ('p50_ms', 'p95_ms', 'p99_ms', 'throughput')
+
+
+def save(results: list[BenchmarkResult], output: str | None, suite: str) -> None:
+    print_results(results)
+    if output:
+        data = {
+            'suite': suite,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': [result.model_dump() for result in results],
+        }
+        Path(output).write_text(json.dumps(data, indent=2))
+
+
+def compare(old_file: str, new_file: str) -> None:
+    old = {result['name']: result for result in json.loads(Path(old_file).read_text())['results']}
+    new = {result['name']: result for result in json.loads(Path(new_file).read_text())['results']}
+
+    print(f'{"name":40} ' + ' '.join(f'{field:>22}' for field in COMPARE_FIELDS))
+    for name in [name for name in new if name in old]:
+        cells = []
+        for field in COMPARE_FIELDS:
+            before, after = old[name][field], new[name][field]
+            change = (after - before) / before * 100 if before else 0.0
+            cells.append(f'{after:>12.3f} ({change:+6.1f}%)')
+        print(f'{name:40} ' + ' '.join(cells))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    micro_parser = subparsers.add_parser('micro')
+    micro_parser.add_argument('--iterations', type=int, default=10000)
+    micro_parser.add_argument('--password-iterations', type=int, default=50)
+    micro_parser.add_argument('--concurrency', type=int, default=4)
+    micro_parser.add_argument('--output')
+
+    scenarios_parser = subparsers.add_parser('scenarios')
+    # Never the app database: its users and whitelist collections are dropped
+    scenarios_parser.add_argument('--db', required=True, help='Database to (re)create, must end in "_bench"')
+    scenarios_parser.add_argument('--users', type=int, default=1000)
+    scenarios_parser.add_argument('--iterations', type=int, default=2000)
+    scenarios_parser.add_argument('--concurrency', type=int, default=16)
+    scenarios_parser.add_argument('--output')
+
+    compare_parser = subparsers.add_parser('compare')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+
+    args = parser.parse_args()
+
+    if args.command == 'micro':
+        from benchmarks import micro
+        save(micro.run(args.iterations, args.password_iterations, args.concurrency), args.output, 'micro')
+    elif args.command == 'scenarios':
+        if not args.db.endswith(BENCH_DB_SUFFIX):
+            parser.error(f'--db must name a dedicated database ending in "{BENCH_DB_SUFFIX}"')
+        # Settings are read when scenarios imports the app, the process environment wins over .docs/.env
+        os.environ['DB_NAME'] = args.db
+        from benchmarks import scenarios
+        save(scenarios.run(args.users, args.iterations, args.concurrency), args.output, 'scenarios')
+    else:
+        compare(args.old, args.new)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
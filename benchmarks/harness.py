@@ -0,0 +1,89 @@
+import asyncio
+import statistics
+import time
+from typing import Any, Awaitable, Callable
+
+from pydantic import BaseModel
+
+# Scenarios drop collections, so they only run against databases with this suffix
+BENCH_DB_SUFFIX = '_bench'
+
+
+class BenchmarkResult(BaseModel):
+    name: str
+    iterations: int
+    concurrency: int = 1
+    errors: int = 0
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    max_ms: float
+    throughput: float
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(name: str, latencies: list[float], elapsed: float, concurrency: int = 1,
+              errors: int = 0) -> BenchmarkResult:
+    values = sorted(latency * 1000 for latency in latencies)
+    return BenchmarkResult(
+        name=name,
+        iterations=len(values),
+        concurrency=concurrency,
+        errors=errors,
+        p50_ms=percentile(values, 50),
+        p95_ms=percentile(values, 95),
+        p99_ms=percentile(values, 99),
+        mean_ms=statistics.fmean(values) if values else 0.0,
+        max_ms=values[-1] if values else 0.0,
+        throughput=len(values) / elapsed if elapsed else 0.0,
+    )
+
+
+def bench(name: str, func: Callable[[], Any], iterations: int, warmup: int = 10) -> BenchmarkResult:
+    for _ in range(warmup):
+        func()
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(name, latencies, time.perf_counter() - start)
+
+
+async def bench_async(name: str, func: Callable[[int], Awaitable[Any]], iterations: int,
+                      concurrency: int = 1) -> BenchmarkResult:
+    # func(i) is one request; a failed call (exception or falsy result) counts as an error
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(iterations))
+
+    async def worker():
+        nonlocal errors
+        for index in counter:
+            call_start = time.perf_counter()
+            try:
+                ok = await func(index)
+            except Exception:  # pylint: disable=broad-except
+                ok = False
+            latencies.append(time.perf_counter() - call_start)
+            errors += 0 if ok is not False else 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(name, latencies, time.perf_counter() - start, concurrency=concurrency, errors=errors)
+
+
+def print_results(results: list[BenchmarkResult]) -> None:
+    print(f'{"name":40} {"n":>7} {"conc":>5} {"err":>5} {"p50":>9} {"p95":>9} {"p99":>9} {"ops/s":>10}')
+    for result in results:
+        print(f'{result.name:40} {result.iterations:>7} {result.concurrency:>5} {result.errors:>5} '
+              f'{result.p50_ms:>9.3f} {result.p95_ms:>9.3f} {result.p99_ms:>9.3f} {result.throughput:>10.1f}')
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+
+from bson import ObjectId
+from fastapi import status
+from starlette.requests import Request
+
+import messages
+from benchmarks.harness import BenchmarkResult, bench, bench_async
+from exceptions.api_exception import APIException
+from exceptions.handle_exc import api_exception_handler, exception_handler
+from models.user import User
+from schemas.token import TokenPayload
+from services.password import PasswordService
+from services.token import JWTService
+
+PASSWORD = 'Bench!mark1'
+
+
+def run_jwt(iterations: int) -> list[BenchmarkResult]:
+    jwt_service = JWTService()
+    user = User(id=str(ObjectId()), username='benchmark')
+    token = jwt_service.encode(TokenPayload.access(user))
+
+    return [
+        bench('jwt.encode', lambda: jwt_service.encode(TokenPayload.access(user)), iterations),
+        bench('jwt.decode', lambda: jwt_service.decode(token), iterations),
+        bench('jwt.decode+validate', lambda: TokenPayload.model_validate(jwt_service.decode(token)), iterations),
+    ]
+
+
+def run_model(iterations: int) -> list[BenchmarkResult]:
+    doc = {'_id': ObjectId(), 'username': 'benchmark', 'password': '$2b$12$' + 'x' * 53, 'role': 'guest'}
+    return [
+        bench('User.model_validate', lambda: User.model_validate(dict(doc)), iterations),
+        bench('User.mongo_to_output', lambda: User.mongo_to_output(doc, User.get_output_fields()), iterations),
+    ]
+
+
+def run_error_handlers(iterations: int) -> list[BenchmarkResult]:
+    request = Request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': []})
+    api_exc = APIException(status_code=status.HTTP_400_BAD_REQUEST, detail=messages.password_incorrect,
+                           fields={'password': messages.password_incorrect})
+    exc = RuntimeError('benchmark')
+
+    loop = asyncio.new_event_loop()
+    try:
+        return [
+            bench('handler.api_exception', lambda: loop.run_until_complete(api_exception_handler(request, api_exc)),
+                  iterations),
+            bench('handler.exception', lambda: loop.run_until_complete(exception_handler(request, exc)),
+                  iterations // 10 or 1),
+        ]
+    finally:
+        loop.close()
+
+
+async def run_password(iterations: int, concurrency: int) -> list[BenchmarkResult]:
+    hashed = PasswordService.hash_password(PASSWORD)
+    try:
+        return [
+            await bench_async('password.hash', lambda _: PasswordService.async_hash_password(PASSWORD),
+                              iterations, concurrency),
+            await bench_async('password.verify', lambda _: PasswordService.async_verify_password(PASSWORD, hashed),
+                              iterations, concurrency),
+        ]
+    finally:
+        PasswordService.shutdown()
+
+
+def run(iterations: int = 10000, password_iterations: int = 50, concurrency: int = 4) -> list[BenchmarkResult]:
+    # The exception handler logs a traceback per call, keep it out of the output
+    logging.disable(logging.CRITICAL)
+
+    results = run_jwt(iterations) + run_model(iterations) + run_error_handlers(iterations)
+    results += asyncio.run(run_password(password_iterations, concurrency))
+    return results
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+
+import httpx
+from pymongo import ASCENDING
+
+from benchmarks.harness import BENCH_DB_SUFFIX, BenchmarkResult, bench_async
+from constants.mongo import MongoUpdateType
+from constants.user_role import UserRole
+from main import app, lifespan
+from models.user import User
+from models.whitelist_token import WhiteListToken
+from services.mongodb import MongoDBService
+from services.user import UserService
+
+PASSWORD = 'Bench!mark1'
+ADMIN_USERNAME = 'bench_admin'
+
+
+async def setup_database(mongo: MongoDBService, users: int) -> None:
+    if not mongo.db.name.endswith(BENCH_DB_SUFFIX):
+        raise RuntimeError(f'Refusing to drop collections of {mongo.db.name!r}: '
+                           f'scenarios only run against a database ending in {BENCH_DB_SUFFIX!r}')
+
+    await mongo.db.drop_collection(User.get_mongodb_collection())
+    await mongo.db.drop_collection(WhiteListToken.get_mongodb_collection())
+
+    await mongo.create_index(User, keys=[('username', ASCENDING)], unique=True, name='username_index')
+    await mongo.create_index(WhiteListToken, keys=[('jti', ASCENDING)], name='jti_index', unique=True)
+    await mongo.create_index(WhiteListToken, keys=[('_user_id', ASCENDING)], name='user_id_index')
+
+    user_service = UserService(mongo=mongo)
+    credentials = [(ADMIN_USERNAME, PASSWORD)] + [(f'bench_user_{index}', PASSWORD) for index in range(users)]
+    await user_service.bulk_create(credentials)
+    await mongo.update_one(User, queries={'username': ADMIN_USERNAME},
+                           update_type=MongoUpdateType.SET, role=UserRole.ADMIN.value)
+
+
+async def login(client: httpx.AsyncClient, username: str) -> dict:
+    response = await client.post('/auth/login', json={'username': username, 'password': PASSWORD})
+    response.raise_for_status()
+    return response.json()
+
+
+async def run_scenarios(users: int, iterations: int, concurrency: int) -> list[BenchmarkResult]:
+    results = []
+
+    async with lifespan(app):
+        await setup_database(app.state.mongo, users)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            usernames = [f'bench_user_{index}' for index in range(users)]
+
+            # Login storm: every call pays a bcrypt verification
+            results.append(await bench_async(
+                'login_storm', lambda index: login(client, usernames[index % users]),
+                iterations=min(iterations, users * 2), concurrency=concurrency,
+            ))
+
+            tokens = await asyncio.gather(*(login(client, username) for username in usernames[:concurrency]))
+            refresh_tokens = [token['refresh']['token'] for token in tokens]
+            access_tokens = [token['access']['token'] for token in tokens]
+
+            # Refresh rotation: each chain keeps rotating its own refresh token
+            async def rotate(index: int) -> bool:
+                chain = index % len(refresh_tokens)
+                response = await client.post('/auth/refresh', json={'token': refresh_tokens[chain]})
+                if response.status_code != 200:
+                    return False
+                refresh_tokens[chain] = response.json()['refresh']['token']
+                return True
+
+            results.append(await bench_async('refresh_rotation', rotate, iterations, concurrency=len(refresh_tokens)))
+
+            # /users/me at high concurrency
+            async def get_me(index: int) -> bool:
+                headers = {'Authorization': f'Bearer {access_tokens[index % len(access_tokens)]}'}
+                response = await client.get('/users/me', headers=headers)
+                return response.status_code == 200
+
+            results.append(await bench_async('users_me', get_me, iterations, concurrency=concurrency * 4))
+
+            # Deep pagination: offset vs cursor
+            admin_headers = {'Authorization': f'Bearer {(await login(client, ADMIN_USERNAME))["access"]["token"]}'}
+
+            async def offset_page(index: int) -> bool:
+                offset = max(0, users - 100 - index % 100)
+                response = await client.get('/users', params={'limit': 100, 'offset': offset}, headers=admin_headers)
+                return response.status_code == 200
+
+            results.append(await bench_async('users_deep_offset', offset_page, iterations // 10 or 1, concurrency))
+
+            cursors: list[str | None] = [None]
+
+            async def cursor_page(index: int) -> bool:
+                params: dict = {'limit': 100}
+                if cursors[-1]:
+                    params['cursor'] = cursors[-1]
+                response = await client.get('/users', params=params, headers=admin_headers)
+                cursors.append(response.headers.get('X-Next-Cursor'))
+                return response.status_code == 200
+
+            results.append(await bench_async('users_cursor_walk', cursor_page, max(1, users // 100), 1))
+
+    return results
+
+
+def run(users: int = 1000, iterations: int = 2000, concurrency: int = 16) -> list[BenchmarkResult]:
+    logging.disable(logging.INFO)
+    return asyncio.run(run_scenarios(users, iterations, concurrency))
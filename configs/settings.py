@@ -14,18 +14,96 @@ if not load_dotenv(env_file):
     raise FileNotFoundError(f'.env file does not exist: {env_file}')
 
 
+# Server (python server.py), one worker process per CPU by default
+SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = int(os.getenv('SERVER_PORT', '8000'))
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', str(os.cpu_count() or 1)))
+
+# Seconds a worker waits for in-flight requests after SIGTERM before closing them
+SERVER_GRACEFUL_TIMEOUT = int(os.getenv('SERVER_GRACEFUL_TIMEOUT', '30'))
+
+
 # MongoDB Connection
 MONGO_URI = os.environ['MONGO_URI']
 DB_NAME = os.environ['DB_NAME']
 
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '10'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '2000'))
+MONGO_BULK_BATCH_SIZE = int(os.getenv('MONGO_BULK_BATCH_SIZE', '1000'))
+
+# Commands slower than this are logged by query shape, optionally with an explain of the plan
+MONGO_SLOW_QUERY_MS = float(os.getenv('MONGO_SLOW_QUERY_MS', '100'))
+MONGO_SLOW_QUERY_EXPLAIN = os.getenv('MONGO_SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'
+
+# Create missing model indexes in the background at startup
+MONGO_SYNC_INDEXES = os.getenv('MONGO_SYNC_INDEXES', 'true').lower() == 'true'
+
+# Filtered totals are cached for this many seconds unless an exact count is requested
+MONGO_COUNT_CACHE_TTL = float(os.getenv('MONGO_COUNT_CACHE_TTL', '30'))
+
 
 # JWT config
 SECRET_KEY = os.environ['SECRET_KEY']
 ALGORITHM = os.getenv('ALGORITHM', 'HS256')
 
+# Asymmetric algorithms (RS256, ES256, EdDSA...) sign with <kid>.pem private keys from this directory.
+# <kid>.pub.pem files are public keys still accepted for verification (e.g. keys being rotated out).
+JWT_KEYS_DIR = Path(os.getenv('JWT_KEYS_DIR', str(BASE_DIR / '.docs/keys')))
+JWT_ACTIVE_KID = os.getenv('JWT_ACTIVE_KID') or None
+JWT_KEYS_RELOAD_SECONDS = float(os.getenv('JWT_KEYS_RELOAD_SECONDS', '60'))
+
+# Put role, username and token epoch into access tokens so authentication skips the user lookup
+STATELESS_ACCESS_TOKEN = os.getenv('STATELESS_ACCESS_TOKEN', 'false').lower() == 'true'
+TOKEN_EPOCH_CACHE_TTL = float(os.getenv('TOKEN_EPOCH_CACHE_TTL', '5'))
+
+# Verified access tokens kept per worker until they expire, repeat requests skip the signature check
+VERIFIED_TOKEN_CACHE_SIZE = int(os.getenv('VERIFIED_TOKEN_CACHE_SIZE', '10000'))
+
+# Per-worker in-memory copy of the refresh token whitelist, kept current by a change stream
+WHITELIST_MIRROR = os.getenv('WHITELIST_MIRROR', 'false').lower() == 'true'
+WHITELIST_MIRROR_MAX_LAG = float(os.getenv('WHITELIST_MIRROR_MAX_LAG', '5'))
+
 ACCESS_EXPIRED = timedelta(minutes=5)
 REFRESH_EXPIRED = timedelta(days=1)
 
 
+# Password hashing
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '64'))
+
+# Number of bcrypt rounds, or "auto" to calibrate at startup against BCRYPT_TARGET_MS
+BCRYPT_ROUNDS = os.getenv('BCRYPT_ROUNDS', '12')
+BCRYPT_TARGET_MS = int(os.getenv('BCRYPT_TARGET_MS', '250'))
+
+
+# Login throttling: token buckets per username and per client IP, kept in "memory" (per worker),
+# in "mongo" (shared by every worker) or "off"
+LOGIN_THROTTLE_STORE = os.getenv('LOGIN_THROTTLE_STORE', 'memory').lower()
+LOGIN_USER_BURST = int(os.getenv('LOGIN_USER_BURST', '5'))
+LOGIN_USER_PER_MINUTE = float(os.getenv('LOGIN_USER_PER_MINUTE', '5'))
+LOGIN_IP_BURST = int(os.getenv('LOGIN_IP_BURST', '20'))
+LOGIN_IP_PER_MINUTE = float(os.getenv('LOGIN_IP_PER_MINUTE', '30'))
+LOGIN_THROTTLE_CACHE_SIZE = int(os.getenv('LOGIN_THROTTLE_CACHE_SIZE', '100000'))
+
+
+# User cache (TTL bounds staleness when change streams are unavailable)
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '5'))
+
+# last_seen_at/last_login_at are buffered per worker and written in bulk every ACTIVITY_FLUSH_SECONDS,
+# users beyond ACTIVITY_BUFFER_SIZE are dropped until the next flush
+ACTIVITY_FLUSH_SECONDS = float(os.getenv('ACTIVITY_FLUSH_SECONDS', '10'))
+ACTIVITY_BUFFER_SIZE = int(os.getenv('ACTIVITY_BUFFER_SIZE', '100000'))
+
+# Max users per bulk import request
+USER_BULK_MAX = int(os.getenv('USER_BULK_MAX', '10000'))
+# Bulk imports are hashed and written this many users at a time, so progress survives a failure
+USER_BULK_CHUNK_SIZE = int(os.getenv('USER_BULK_CHUNK_SIZE', '100'))
+
+# Documents fetched per cursor batch (and written per response chunk) by exports
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+
+
 # Location
 TIMEZONE = os.getenv('TIMEZONE', 'Asia/Ho_Chi_Minh')
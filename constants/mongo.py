@@ -3,3 +3,5 @@ from enum import StrEnum
 
 class MongoUpdateType(StrEnum):
     SET = '$set'
+    INC = '$inc'
+    MAX = '$max'
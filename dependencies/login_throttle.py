@@ -0,0 +1,12 @@
+from typing import Annotated
+
+from fastapi import Depends
+
+from dependencies.mongodb import MongoDBDep
+from services.login_throttle import LoginThrottleService
+
+
+async def get_login_throttle_service(mongo: MongoDBDep):
+    return LoginThrottleService(mongo=mongo)
+
+LoginThrottleServiceDep = Annotated[LoginThrottleService, Depends(get_login_throttle_service)]
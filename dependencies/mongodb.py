@@ -1,17 +1,12 @@
 from typing import Annotated
 
-from fastapi import Depends
+from fastapi import Depends, Request
 
 from services.mongodb import MongoDBService
 
 
-async def get_mongo_service():
-    service = MongoDBService()
-
-    try:
-        yield service
-    finally:
-        await service.close()
+async def get_mongo_service(request: Request):
+    return request.app.state.mongo.view()
 
 
 MongoDBDep = Annotated[MongoDBService, Depends(get_mongo_service)]
@@ -5,6 +5,7 @@ from fastapi.security import OAuth2PasswordBearer
 from jwt import InvalidTokenError
 
 import messages
+from configs.settings import STATELESS_ACCESS_TOKEN
 from constants.header import BEARER_ERROR_HEADER
 from constants.token_type import TokenType
 from constants.user_role import UserRole
@@ -12,6 +13,7 @@ from dependencies.mongodb import MongoDBDep
 from dependencies.token import TokenServiceDep
 from exceptions.api_exception import APIException
 from models.user import User
+from services.activity import activity_tracker
 from services.user import UserService
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='token')
@@ -38,16 +40,47 @@ async def get_current_user(
         raise APIException(status_code=status.HTTP_401_UNAUTHORIZED, headers=BEARER_ERROR_HEADER,
                            detail=messages.access_required, fields={'bearer_token': messages.access_required})
 
+    if STATELESS_ACCESS_TOKEN and token_payload.is_stateless:
+        token_epoch = await user_service.get_token_epoch(token_payload.sub)
+
+        if token_epoch is None:
+            raise APIException(status_code=status.HTTP_401_UNAUTHORIZED, headers=BEARER_ERROR_HEADER,
+                               detail=messages.user_not_found, fields={'bearer_token': messages.user_not_found})
+
+        if token_payload.epoch != token_epoch:
+            raise APIException(status_code=status.HTTP_401_UNAUTHORIZED, headers=BEARER_ERROR_HEADER,
+                               detail=messages.token_invalid, fields={'bearer_token': messages.token_revoked})
+
+        activity_tracker.seen(token_payload.sub)
+        return token_payload.to_user(token_epoch)
+
     user = await user_service.get_by_id(token_payload.sub)
 
     if not user:
         raise APIException(status_code=status.HTTP_401_UNAUTHORIZED, headers=BEARER_ERROR_HEADER,
                            detail=messages.user_not_found, fields={'bearer_token': messages.user_not_found})
+
+    activity_tracker.seen(user.id)
     return user
 
 UserDep = Annotated[User, Depends(get_current_user)]
 
 
+async def get_current_full_user(user: UserDep, user_service: UserServiceDep) -> User:
+    # Stateless principals only carry the token claims (no password hash)
+    if not STATELESS_ACCESS_TOKEN:
+        return user
+
+    full_user = await user_service.get_by_id(user.id)
+
+    if not full_user:
+        raise APIException(status_code=status.HTTP_401_UNAUTHORIZED, headers=BEARER_ERROR_HEADER,
+                           detail=messages.user_not_found, fields={'bearer_token': messages.user_not_found})
+    return full_user
+
+FullUserDep = Annotated[User, Depends(get_current_full_user)]
+
+
 async def get_admin_user(user: UserDep):
     if user.role != UserRole.ADMIN:
         raise APIException(status_code=status.HTTP_403_FORBIDDEN, headers=BEARER_ERROR_HEADER,
@@ -1,11 +1,35 @@
+from functools import lru_cache
+
 from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
 
 import messages
 from configs.logger import logger
 from exceptions.api_exception import APIException
-from schemas.api.error import ErrorResponse, FieldError
+from utils import json, timezone
+from utils.response import RawJSONResponse
+
+# Bodies follow schemas.api.error.ErrorResponse, built from bytes to skip model validation and dumping
+EMPTY_DETAILS = b'[]'
+
+# Most messages are static strings, but some are formatted with user input (e.g. not_allowed_field)
+ERROR_PREFIX_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=ERROR_PREFIX_CACHE_SIZE)
+def error_prefix(status_code: int, message: str) -> bytes:
+    return b'{"status_code":%d,"message":%s,"details":' % (status_code, json.dumps(message))
+
+
+def error_response(
+    status_code: int, message: str, details: list[dict] | None = None, headers: dict[str, str] | None = None
+) -> RawJSONResponse:
+    content = b''.join((
+        error_prefix(status_code, message),
+        json.dumps(details) if details else EMPTY_DETAILS,
+        b',"timestamp":', json.dumps(timezone.now()), b'}',
+    ))
+    return RawJSONResponse(content, status_code=status_code, headers=headers)
 
 
 async def validation_error_handler(request: Request, exc: RequestValidationError):
@@ -13,31 +37,26 @@ async def validation_error_handler(request: Request, exc: RequestValidationError
     for error in exc.errors():
         messages_list = [error['msg']]
         fields_error = [
-            FieldError(field=loc, messages=messages_list)
+            {'field': loc, 'messages': messages_list}
             for loc in error['loc'] if isinstance(loc, str) and loc not in ('body', 'query', 'path')
         ]
-        details += fields_error or [FieldError(field='__all__', messages=messages_list)]
+        details += fields_error or [{'field': '__all__', 'messages': messages_list}]
 
-    err_res = ErrorResponse(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                            message=messages.validation_failed, details=details)
-    return JSONResponse(err_res.model_dump(), status_code=err_res.status_code)
+    return error_response(status.HTTP_422_UNPROCESSABLE_ENTITY, messages.validation_failed, details)
 
 
 async def api_exception_handler(request: Request, exc: APIException):
-    details = [FieldError(field=field, messages=messages) for field, messages in exc.fields.items()]
-    err_res = ErrorResponse(status_code=exc.status_code, message=exc.detail, details=details)
-    return JSONResponse(err_res.model_dump(), status_code=err_res.status_code, headers=exc.headers)
+    details = [{'field': field, 'messages': messages} for field, messages in exc.fields.items()]
+    return error_response(exc.status_code, exc.detail, details, headers=exc.headers)
 
 
 async def http_exception_handler(request: Request, exc: HTTPException):
-    err_res = ErrorResponse(status_code=exc.status_code, message=exc.detail)
-    return JSONResponse(err_res.model_dump(), status_code=err_res.status_code, headers=exc.headers)
+    return error_response(exc.status_code, exc.detail, headers=exc.headers)
 
 
 async def exception_handler(request: Request, exc: Exception):
     logger.exception('Internal server error')
-    err_res = ErrorResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, message=messages.internal_server_error)
-    return JSONResponse(err_res.model_dump(), status_code=err_res.status_code)
+    return error_response(status.HTTP_500_INTERNAL_SERVER_ERROR, messages.internal_server_error)
 
 
 def handle_exc(app: FastAPI):
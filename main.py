@@ -1,16 +1,83 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
+from bson import ObjectId
 from fastapi import FastAPI
 
 from configs.logger import config_logging
+from configs.settings import MONGO_SYNC_INDEXES, WHITELIST_MIRROR
 from exceptions.handle_exc import handle_exc
+from models.user import User
 from routers.auth import auth_router
+from routers.metrics import mark_worker_dead, metrics_router, sample_gauges
 from routers.users import users_router
+from routers.well_known import well_known_router
+from schemas.token import TokenPayload
+from services.activity import activity_tracker
+from services.index_sync import sync_indexes
+from services.jwt_keys import jwt_keys
+from services.mongodb import MongoDBService
+from services.password import PasswordService
+from services.token import JWTService
+from services.user import UserService
+from services.whitelist_mirror import whitelist_mirror
 
 # Config logging
 config_logging()
 
-app = FastAPI()
+
+def warm_up(app: FastAPI) -> None:
+    # First-request work done once per worker at startup: OpenAPI schema, pydantic validators, JWT signing
+    app.openapi()
+
+    user = User.model_validate({'_id': ObjectId(), 'username': 'warm_up', 'password': '<not set>'})
+    user.model_dump(mode='json')
+
+    jwt_service = JWTService()
+    TokenPayload.model_validate(jwt_service.decode(jwt_service.encode(TokenPayload.access(user))))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    jwt_keys.load()
+
+    # One pooled client per worker, shared by every request
+    app.state.mongo = MongoDBService()
+    await app.state.mongo.warm_up()
+    await PasswordService.configure_rounds()
+    warm_up(app)
+
+    background_tasks = [
+        asyncio.create_task(UserService.watch_changes(app.state.mongo)),
+        asyncio.create_task(jwt_keys.watch()),
+        asyncio.create_task(activity_tracker.run(app.state.mongo)),
+        asyncio.create_task(sample_gauges()),
+    ]
+    if WHITELIST_MIRROR:
+        background_tasks.append(asyncio.create_task(whitelist_mirror.run(app.state.mongo)))
+    if MONGO_SYNC_INDEXES:
+        background_tasks.append(asyncio.create_task(sync_indexes(app.state.mongo)))
+
+    try:
+        yield
+    finally:
+        for task in background_tasks:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+        # Requests drained by now, write what is still buffered
+        await activity_tracker.flush(app.state.mongo)
+        await app.state.mongo.close()
+        PasswordService.shutdown()
+        mark_worker_dead()
+
+
+app = FastAPI(lifespan=lifespan)
 handle_exc(app)
 
 # Include routers
 app.include_router(auth_router)
 app.include_router(users_router)
+app.include_router(metrics_router)
+app.include_router(well_known_router)
@@ -2,8 +2,12 @@
 
 validation_failed = 'Validation failed. Please check your input.'
 internal_server_error = 'Internal server error. Please try again later.'
+server_busy = 'Server is busy. Please try again later.'
+too_many_attempts = 'Too many login attempts. Please try again later.'
 
 not_allowed_order_by = 'Not allowed order by [{field}]'
+cursor_invalid = 'Invalid pagination cursor.'
+not_allowed_field = 'Not allowed field [{field}]'
 
 token_invalid = 'Invalid token. Please log in again.'
 access_required = 'Access token is required.'
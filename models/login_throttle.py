@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from pymongo import ASCENDING, IndexModel
+
+from schemas.base import MongoModel
+
+
+class LoginThrottle(MongoModel):
+    # Token bucket shared by every worker, key is "user:<username>" or "ip:<address>"
+    key: str
+    tokens: float
+    allowed: bool
+    updated_at: datetime
+    expired: datetime
+
+    mongodb_collection = 'login_throttles'
+    indexes = [
+        IndexModel([('key', ASCENDING)], name='key_index', unique=True),
+        # A bucket left alone until it is full again is the same as no bucket
+        IndexModel([('expired', ASCENDING)], name='expired_ttl', expireAfterSeconds=0),
+    ]
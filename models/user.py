@@ -1,11 +1,16 @@
+from datetime import datetime
 from typing import Any
 
 from pydantic import Field
+from pymongo import ASCENDING, IndexModel
 
 from constants.user_role import UserRole
 from schemas.base import MongoModel
 from services.password import PasswordService
 
+# Fields written only by the activity tracker
+ACTIVITY_FIELDS = ('last_login_at', 'last_seen_at')
+
 
 class User(MongoModel):
     username: str
@@ -13,14 +18,30 @@ class User(MongoModel):
 
     role: UserRole = UserRole.GUEST
 
+    # Only changed through $inc, never written back from the model
+    token_epoch: int = Field(default=0, exclude=True)
+
+    # Written in batches by the activity tracker, never written back from the model
+    last_login_at: datetime | None = None
+    last_seen_at: datetime | None = None
+
     mongodb_collection = 'users'
     allowed_order_fields = ('id', 'username')
+    indexes = [
+        IndexModel([('username', ASCENDING)], name='username_index', unique=True),
+        # Keyset pagination sorts by username with _id as tiebreaker
+        IndexModel([('username', ASCENDING), ('_id', ASCENDING)], name='username_id_index'),
+    ]
+
+    async def set_password(self, plain_password: str) -> None:
+        self.password = await PasswordService.async_hash_password(plain_password)
 
-    def set_password(self, plain_password: str) -> None:
-        self.password = PasswordService.hash_password(plain_password)
+    async def verify(self, plain_password: str) -> bool:
+        return await PasswordService.async_verify_password(plain_password=plain_password,
+                                                           hashed_password=self.password)
 
-    def verify(self, plain_password: str) -> bool:
-        return PasswordService.verify_password(plain_password=plain_password, hashed_password=self.password)
+    def needs_rehash(self) -> bool:
+        return PasswordService.needs_rehash(self.password)
 
     def model_dump_mongo(self, *args, **kwargs) -> dict[str, Any]:
         dump_data = super().model_dump_mongo(*args, **kwargs)
@@ -3,6 +3,7 @@ from typing import Any
 
 from bson import ObjectId
 from pydantic import model_validator
+from pymongo import ASCENDING, IndexModel
 
 from schemas.base import MongoModel
 
@@ -13,6 +14,11 @@ class WhiteListToken(MongoModel):
     expired: datetime
 
     mongodb_collection = 'white_list_tokens'
+    indexes = [
+        IndexModel([('jti', ASCENDING)], name='jti_index', unique=True),
+        IndexModel([('_user_id', ASCENDING)], name='user_id_index'),
+        IndexModel([('expired', ASCENDING)], name='expired_ttl', expireAfterSeconds=0),
+    ]
 
     def model_dump_mongo(self, *args, **kwargs) -> dict[str, Any]:
         data = super().model_dump_mongo(*args, **kwargs)
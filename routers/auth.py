@@ -1,24 +1,35 @@
-from fastapi import APIRouter, status
+import asyncio
+
+from fastapi import APIRouter, BackgroundTasks, Request, status
 from jwt import InvalidTokenError
 
 import messages
 from constants.token_type import TokenType
+from dependencies.login_throttle import LoginThrottleServiceDep
 from dependencies.token import TokenServiceDep
 from dependencies.user import UserServiceDep
 from exceptions.api_exception import APIException
 from schemas.api.login import LoginRequest
 from schemas.api.refresh_token import RefreshTokenRequest
 from schemas.token import TokenResponse
+from services.activity import activity_tracker
+from services.metrics import MetricsRoute
 
-auth_router = APIRouter(prefix='/auth', tags=['Authentication'])
+auth_router = APIRouter(prefix='/auth', tags=['Authentication'], route_class=MetricsRoute)
 
 
 @auth_router.post('/login')
 async def login(
     user_service: UserServiceDep,
     token_service: TokenServiceDep,
+    login_throttle_service: LoginThrottleServiceDep,
     request: LoginRequest,
+    http_request: Request,
+    background_tasks: BackgroundTasks,
 ) -> TokenResponse:
+    await login_throttle_service.check(username=request.username,
+                                       ip=http_request.client.host if http_request.client else None)
+
     user = await user_service.get_by_username(request.username)
 
     if not user:
@@ -33,6 +44,10 @@ async def login(
         raise APIException(status_code=status.HTTP_400_BAD_REQUEST,
                            detail=messages.password_incorrect, fields={'password': messages.password_incorrect})
 
+    if user.needs_rehash():
+        background_tasks.add_task(user_service.rehash_password, user=user, password=request.password)
+
+    activity_tracker.logged_in(user.id)
     return await token_service.create_token_response(user)
 
 
@@ -48,20 +63,26 @@ async def refresh_token(
         raise APIException(status_code=status.HTTP_400_BAD_REQUEST,
                            detail=messages.token_invalid, fields={'token': str(exc)}) from exc
 
-    if await token_service.is_revoked(jti=token_payload.jti):
-        raise APIException(status_code=status.HTTP_400_BAD_REQUEST,
-                           detail=messages.token_invalid, fields={'token': messages.token_revoked})
-
     if token_payload.type != TokenType.REFRESH:
         raise APIException(status_code=status.HTTP_400_BAD_REQUEST,
                            detail=messages.token_invalid, fields={'token': messages.refresh_required})
 
-    user = await user_service.get_by_id(token_payload.sub)
+    # Replayed or revoked tokens are rejected without a database round-trip when the mirror is enabled
+    if token_service.is_known_revoked(jti=token_payload.jti, issued_at=token_payload.iat):
+        raise APIException(status_code=status.HTTP_400_BAD_REQUEST,
+                           detail=messages.token_invalid, fields={'token': messages.token_revoked})
+
+    whitelist_token, user = await asyncio.gather(
+        token_service.consume_refresh(jti=token_payload.jti),
+        user_service.get_by_id(token_payload.sub),
+    )
+
+    if not whitelist_token or whitelist_token.user_id != token_payload.sub:
+        raise APIException(status_code=status.HTTP_400_BAD_REQUEST,
+                           detail=messages.token_invalid, fields={'token': messages.token_revoked})
 
     if not user:
         raise APIException(status_code=status.HTTP_400_BAD_REQUEST,
                            detail=messages.token_invalid, fields={'token': messages.user_not_found})
 
-    await token_service.revoke(jti=token_payload.jti)
-
     return await token_service.create_token_response(user)
@@ -0,0 +1,50 @@
+import asyncio
+import os
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+
+from services.activity import activity_tracker
+from services.metrics import USER_ACTIVITY_PENDING, USER_CACHE_SIZE, VERIFIED_TOKEN_CACHE_SIZE
+from services.token import JWTService
+from services.user import UserService
+
+metrics_router = APIRouter(tags=['Metrics'])
+
+GAUGE_SAMPLE_SECONDS = 5
+
+# Set by server.py when it runs several workers: each worker writes its samples there and any of them
+# can answer a scrape with the merged values
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def get_registry() -> CollectorRegistry:
+    if not MULTIPROCESS:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+registry = get_registry()
+
+
+async def sample_gauges(interval: float = GAUGE_SAMPLE_SECONDS) -> None:
+    # Sizes of per-worker structures, sampled instead of being updated on every cache write
+    while True:
+        USER_CACHE_SIZE.set(len(UserService.cache))
+        VERIFIED_TOKEN_CACHE_SIZE.set(len(JWTService.verified))
+        USER_ACTIVITY_PENDING.set(len(activity_tracker))
+        await asyncio.sleep(interval)
+
+
+def mark_worker_dead() -> None:
+    # Drops this worker's live gauges (in-flight requests, pool connections...) from the merged values
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+@metrics_router.get('/metrics', include_in_schema=False)
+async def metrics() -> Response:
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
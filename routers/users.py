@@ -1,16 +1,29 @@
-from fastapi import APIRouter, Path, status
+import asyncio
+
+from fastapi import APIRouter, Path, Query, status
+from fastapi.responses import StreamingResponse
 
 import messages
+from configs.settings import EXPORT_BATCH_SIZE, STATELESS_ACCESS_TOKEN
+from constants.export_format import ExportFormat
 from dependencies.token import TokenServiceDep
-from dependencies.user import AdminUserDep, CurrentOrAdminUserDep, UserDep, UserServiceDep
+from dependencies.user import AdminUserDep, CurrentOrAdminUserDep, FullUserDep, UserServiceDep
 from exceptions.api_exception import APIException
 from models.user import User
 from schemas.api.change_password import ChangePasswordRequest
+from schemas.api.fields_query import FieldsQueryDep
 from schemas.api.list_query import ListQueryDep
+from schemas.api.list_response import ListResponse
+from schemas.api.user_bulk_create import UserBulkCreateRequest
 from schemas.api.user_create import UserCreateRequest
 from schemas.api.user_update import UserUpdateRequest
+from schemas.bulk_write import BulkWriteReport
+from services.metrics import MetricsRoute
+from utils import json
+from utils.export import MEDIA_TYPES, export_chunks
+from utils.response import RawJSONResponse
 
-users_router = APIRouter(prefix='/users', tags=['User'])
+users_router = APIRouter(prefix='/users', tags=['User'], route_class=MetricsRoute)
 
 
 @users_router.post('', status_code=status.HTTP_201_CREATED)
@@ -18,39 +31,79 @@ async def register_user(
     user_service: UserServiceDep,
     request: UserCreateRequest,
 ) -> User:
-    if await user_service.is_exist_username(request.username):
-        raise APIException(status_code=status.HTTP_409_CONFLICT,
-                           detail=messages.user_exists, fields={'username': messages.user_exists})
     return await user_service.create(username=request.username, password=request.password)
 
 
-@users_router.get('')
+@users_router.post('/bulk')
+async def bulk_create_users(
+    auth_user: AdminUserDep,
+    user_service: UserServiceDep,
+    request: UserBulkCreateRequest,
+) -> BulkWriteReport:
+    credentials = [(user.username, user.password) for user in request.users]
+    return await user_service.bulk_create(credentials, upsert=request.upsert)
+
+
+@users_router.get('', response_model=list[User] | ListResponse[User])
 async def get_all_users(
     auth_user: AdminUserDep,
     user_service: UserServiceDep,
     list_query: ListQueryDep,
-) -> list[User]:
-    return await user_service.get_list(limit=list_query.limit, offset=list_query.offset, order_by=list_query.order_by)
+) -> RawJSONResponse:
+    # Documents go from BSON to JSON bytes without per-document model validation
+    get_page = user_service.get_page_raw(limit=list_query.limit, offset=list_query.offset,
+                                         order_by=list_query.order_by, cursor=list_query.cursor,
+                                         fields=list_query.fields)
+
+    if list_query.envelope:
+        (users, next_cursor), total = await asyncio.gather(get_page, user_service.count(exact=list_query.exact))
+        content = {'items': users, 'total': total, 'next': next_cursor}
+    else:
+        users, next_cursor = await get_page
+        content = users
+
+    headers = {'X-Next-Cursor': next_cursor} if next_cursor else None
+    return RawJSONResponse(json.dumps(content), headers=headers)
+
+
+@users_router.get('/export', response_class=StreamingResponse)
+async def export_users(
+    auth_user: AdminUserDep,
+    user_service: UserServiceDep,
+    fields_query: FieldsQueryDep,
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias='format'),
+    order_by: str | None = Query(None, description='Sort field (use -field for descending, e.g. -username)'),
+) -> StreamingResponse:
+    fields = fields_query.fields or User.get_output_fields()
+    rows = user_service.export(order_by=order_by, fields=fields)
+    return StreamingResponse(export_chunks(rows, export_format, fields, EXPORT_BATCH_SIZE),
+                             media_type=MEDIA_TYPES[export_format],
+                             headers={'Content-Disposition': f'attachment; filename="users.{export_format}"'})
 
 
 @users_router.get('/me')
 async def get_me(
-    auth_user: UserDep,
+    auth_user: FullUserDep,
 ) -> User:
     return auth_user
 
 
-@users_router.get('/{user_id}')
+@users_router.get('/{user_id}', response_model=User)
 async def get_user(
     auth_user: CurrentOrAdminUserDep,
     user_service: UserServiceDep,
+    fields_query: FieldsQueryDep,
     user_id: str = Path(),
-) -> User:
-    user = auth_user if auth_user.id == user_id else await user_service.get_by_id(user_id)
+) -> User | RawJSONResponse:
+    # A stateless principal is only the token claims, the stored user may have changed since
+    if auth_user.id == user_id and not fields_query.fields and not STATELESS_ACCESS_TOKEN:
+        return auth_user
+
+    user = await user_service.get_by_id_raw(user_id, fields=fields_query.fields)
     if not user:
         raise APIException(status_code=status.HTTP_404_NOT_FOUND,
                            detail=messages.user_not_found, fields={'user_id': messages.user_not_found})
-    return user
+    return RawJSONResponse(json.dumps(user))
 
 
 @users_router.put('/{user_id}')
@@ -60,21 +113,17 @@ async def update_user(
     request: UserUpdateRequest,
     user_id: str = Path(),
 ) -> User:
-    user = auth_user if auth_user.id == user_id else await user_service.get_by_id(user_id)
+    user = await user_service.get_by_id(user_id)
     if not user:
         raise APIException(status_code=status.HTTP_404_NOT_FOUND,
                            detail=messages.user_not_found, fields={'user_id': messages.user_not_found})
 
-    if request.username != user.username and await user_service.is_exist_username(request.username):
-        raise APIException(status_code=status.HTTP_409_CONFLICT,
-                           detail=messages.user_exists, fields={'username': messages.user_exists})
-
     return await user_service.update(user, update_data=request.model_dump())
 
 
 @users_router.patch('/change-password', status_code=status.HTTP_204_NO_CONTENT)
 async def change_password(
-    auth_user: UserDep,
+    auth_user: FullUserDep,
     user_service: UserServiceDep,
     token_service: TokenServiceDep,
     request: ChangePasswordRequest,
@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+
+from services.jwt_keys import jwt_keys
+from services.metrics import MetricsRoute
+from utils.response import RawJSONResponse
+
+well_known_router = APIRouter(prefix='/.well-known', tags=['Well-known'], route_class=MetricsRoute)
+
+JWKS_CACHE_CONTROL = 'public, max-age=300'
+
+
+@well_known_router.get('/jwks.json')
+async def jwks() -> RawJSONResponse:
+    # Public keys for verifying access tokens without calling this service
+    return RawJSONResponse(jwt_keys.jwks_bytes, headers={'Cache-Control': JWKS_CACHE_CONTROL})
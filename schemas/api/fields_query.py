@@ -0,0 +1,20 @@
+from typing import Annotated
+
+from fastapi import Depends, Query
+
+
+def split_fields(fields: str | None) -> list[str] | None:
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(',') if field.strip()] or None
+
+
+class FieldsQuery:
+    def __init__(
+        self,
+        fields: str | None = Query(None, description='Comma separated fields to return, e.g. id,username'),
+    ):
+        self.fields = split_fields(fields)
+
+
+FieldsQueryDep = Annotated[FieldsQuery, Depends()]
@@ -2,6 +2,8 @@ from typing import Annotated
 
 from fastapi import Depends, Query
 
+from schemas.api.fields_query import split_fields
+
 
 class ListQuery:
     def __init__(
@@ -9,10 +11,18 @@ class ListQuery:
         limit: int = Query(10, gt=0, le=100),
         offset: int = Query(0, ge=0),
         order_by: str | None = Query(None, description='Sort field (use -field for descending, e.g. -created_at)'),
+        cursor: str | None = Query(None, description='Cursor from the X-Next-Cursor header of the previous page'),
+        fields: str | None = Query(None, description='Comma separated fields to return, e.g. id,username'),
+        envelope: bool = Query(False, description='Wrap the page as {items, total, next}'),
+        exact: bool = Query(False, description='Count the total exactly instead of estimating it'),
     ):
         self.limit = limit
         self.offset = offset
         self.order_by = order_by
+        self.cursor = cursor
+        self.fields = split_fields(fields)
+        self.envelope = envelope
+        self.exact = exact
 
 
 ListQueryDep = Annotated[ListQuery, Depends()]
@@ -0,0 +1,11 @@
+from typing import Generic, TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar('T')
+
+
+class ListResponse(BaseModel, Generic[T]):
+    items: list[T]
+    total: int
+    next: str | None = None
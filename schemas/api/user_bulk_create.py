@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+
+from configs.settings import USER_BULK_MAX
+from schemas.api.user_create import UserCreateRequest
+
+
+class UserBulkCreateRequest(BaseModel):
+    users: list[UserCreateRequest] = Field(min_length=1, max_length=USER_BULK_MAX)
+    upsert: bool = Field(False, description='Reset the password of users that already exist instead of failing')
@@ -1,7 +1,8 @@
-from typing import Any, ClassVar
+from typing import Any, ClassVar, Iterable, Self
 
 from bson import ObjectId
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+from pymongo import IndexModel
 
 from utils.name import camel_to_snake
 
@@ -11,6 +12,15 @@ class MongoModel(BaseModel):
 
     mongodb_collection: ClassVar[str | None] = None
     allowed_order_fields: ClassVar[list[str] | tuple[str, ...] | set[str]] = ()
+    indexes: ClassVar[list[IndexModel]] = []
+
+    # Fields assigned since the object was loaded or last saved
+    _dirty_fields: set[str] = PrivateAttr(default_factory=set)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in type(self).model_fields and getattr(self, name, None) != value:
+            self._dirty_fields.add(name)
+        super().__setattr__(name, value)
 
     @model_validator(mode='before')
     @classmethod
@@ -23,5 +33,44 @@ class MongoModel(BaseModel):
     def get_mongodb_collection(cls) -> str:
         return cls.mongodb_collection or camel_to_snake(cls.__name__)
 
+    @classmethod
+    def get_output_fields(cls) -> list[str]:
+        return [name for name, field in cls.model_fields.items() if not field.exclude]
+
+    @classmethod
+    def mongo_to_output(cls, doc: dict[str, Any], fields: Iterable[str]) -> dict[str, Any]:
+        output: dict[str, Any] = {}
+        for field in fields:
+            if field == 'id':
+                output['id'] = str(doc['_id'])
+            elif field in doc:
+                output[field] = doc[field]
+            elif not cls.model_fields[field].is_required():
+                # Same output as the model for documents written before the field existed
+                output[field] = cls.model_fields[field].get_default(call_default_factory=True)
+        return output
+
+    @classmethod
+    def model_construct_partial(cls, data: dict[str, Any], fields: Iterable[str]) -> Self:
+        # Trusted projected document: skip validation, only the requested fields count as set
+        data = cls.handle_objectid(dict(data))
+        return cls.model_construct(_fields_set={'id', *fields}, **data)
+
+    def model_copy(self, *, update: dict[str, Any] | None = None, deep: bool = False) -> Self:
+        changed = {field for field, value in (update or {}).items() if getattr(self, field, None) != value}
+        copied = super().model_copy(update=update, deep=deep)
+        copied._dirty_fields = self._dirty_fields | changed
+        return copied
+
+    def get_dirty_fields(self) -> set[str]:
+        return self._dirty_fields - {'id'}
+
+    def mark_clean(self) -> None:
+        self._dirty_fields = set()
+
     def model_dump_mongo(self, *args, **kwargs) -> dict[str, Any]:
         return super().model_dump(*args, **kwargs, exclude_none=True, exclude={'id'})
+
+    def model_dump_mongo_dirty(self) -> dict[str, Any]:
+        dirty_fields = self.get_dirty_fields()
+        return {field: value for field, value in self.model_dump_mongo().items() if field in dirty_fields}
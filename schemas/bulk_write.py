@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+
+
+class BulkWriteOpError(BaseModel):
+    index: int
+    code: int
+    message: str
+
+
+class BulkWriteReport(BaseModel):
+    inserted: int = 0
+    matched: int = 0
+    modified: int = 0
+    deleted: int = 0
+    upserted: int = 0
+    errors: list[BulkWriteOpError] = Field(default_factory=list)
+
+    def merge(self, other: 'BulkWriteReport', offset: int = 0) -> None:
+        # offset: position of other's first operation in the whole request
+        self.inserted += other.inserted
+        self.matched += other.matched
+        self.modified += other.modified
+        self.deleted += other.deleted
+        self.upserted += other.upserted
+        self.errors += [error.model_copy(update={'index': error.index + offset}) for error in other.errors]
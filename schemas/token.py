@@ -3,8 +3,9 @@ from datetime import datetime
 
 from pydantic import BaseModel, Field
 
-from configs.settings import ACCESS_EXPIRED, REFRESH_EXPIRED
+from configs.settings import ACCESS_EXPIRED, REFRESH_EXPIRED, STATELESS_ACCESS_TOKEN
 from constants.token_type import TokenType
+from constants.user_role import UserRole
 from models.user import User
 from utils import timezone
 
@@ -16,11 +17,26 @@ class TokenPayload(BaseModel):
     iat: datetime = Field(default_factory=timezone.now)
     exp: datetime
 
+    # Stateless access token claims
+    username: str | None = None
+    role: UserRole | None = None
+    epoch: int | None = None
+
     @classmethod
     def access(cls, user: User):
         now = timezone.now()
+        if STATELESS_ACCESS_TOKEN:
+            return cls(sub=user.id, type=TokenType.ACCESS, iat=now, exp=now+ACCESS_EXPIRED,
+                       username=user.username, role=user.role, epoch=user.token_epoch)
         return cls(sub=user.id, type=TokenType.ACCESS, iat=now, exp=now+ACCESS_EXPIRED)
 
+    @property
+    def is_stateless(self) -> bool:
+        return self.epoch is not None and self.username is not None and self.role is not None
+
+    def to_user(self, token_epoch: int) -> User:
+        return User.model_construct(id=self.sub, username=self.username, role=self.role, token_epoch=token_epoch)
+
     @classmethod
     def refresh(cls, user: User):
         now = timezone.now()
@@ -0,0 +1,60 @@
+# Production entry point: python server.py (run_server.bat is the single-process dev server with reload)
+import importlib.util
+import os
+import tempfile
+from pathlib import Path
+
+import uvicorn
+
+from configs.logger import config_logging, logger
+from configs.settings import BCRYPT_ROUNDS, SERVER_GRACEFUL_TIMEOUT, SERVER_HOST, SERVER_PORT, SERVER_WORKERS
+from services.password import PasswordService
+
+
+def prepare_metrics_dir() -> None:
+    # Workers are separate processes: without a shared directory every scrape would only see one worker's metrics.
+    # prometheus_client reads PROMETHEUS_MULTIPROC_DIR when the workers import it.
+    metrics_dir = Path(os.environ.get('PROMETHEUS_MULTIPROC_DIR') or tempfile.mkdtemp(prefix='d_money_flow_metrics_'))
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+
+    # Files left by a previous run would be merged into this one
+    for stale_file in metrics_dir.glob('*.db'):
+        stale_file.unlink()
+
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = str(metrics_dir)
+    logger.info('Aggregating metrics of %d workers in %s', SERVER_WORKERS, metrics_dir)
+
+
+def main() -> None:
+    config_logging()
+
+    if SERVER_WORKERS > 1:
+        prepare_metrics_dir()
+
+    # Calibrate once here so every worker hashes with the same cost (workers read it from the environment)
+    if BCRYPT_ROUNDS == 'auto':
+        os.environ['BCRYPT_ROUNDS'] = str(PasswordService.calibrate())
+        logger.info('Calibrated %s bcrypt rounds for all workers', os.environ['BCRYPT_ROUNDS'])
+
+    # Same choice as uvicorn's "auto", spelled out so the log shows what each worker runs on
+    loop = 'uvloop' if importlib.util.find_spec('uvloop') else 'asyncio'
+    http = 'httptools' if importlib.util.find_spec('httptools') else 'h11'
+    logger.info('Starting %d workers on %s:%d (loop=%s, http=%s)', SERVER_WORKERS, SERVER_HOST, SERVER_PORT, loop, http)
+
+    # Each worker finishes its lifespan startup (warm-up included) before it accepts connections.
+    # On SIGTERM workers stop accepting, drain in-flight requests for up to SERVER_GRACEFUL_TIMEOUT
+    # seconds, then run the lifespan shutdown.
+    uvicorn.run(
+        'main:app',
+        host=SERVER_HOST,
+        port=SERVER_PORT,
+        workers=SERVER_WORKERS,
+        loop=loop,
+        http=http,
+        timeout_graceful_shutdown=SERVER_GRACEFUL_TIMEOUT,
+        proxy_headers=True,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from configs.logger import logger
+from configs.settings import ACTIVITY_BUFFER_SIZE, ACTIVITY_FLUSH_SECONDS
+from constants.mongo import MongoUpdateType
+from models.user import User
+from services.metrics import USER_ACTIVITY_UPDATES
+from services.mongodb import MongoDBService
+from utils import timezone
+
+
+class ActivityTracker:
+    def __init__(self, max_size: int = ACTIVITY_BUFFER_SIZE) -> None:
+        self.max_size = max_size
+
+        # user id -> latest time per field, a user seen 100 times between flushes is still one write
+        self.pending: dict[str, dict[str, datetime]] = {}
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    # ****************************************
+    # Record
+    # ****************************************
+    def seen(self, user_id: str) -> None:
+        self.record(user_id, last_seen_at=timezone.now())
+
+    def logged_in(self, user_id: str) -> None:
+        now = timezone.now()
+        self.record(user_id, last_login_at=now, last_seen_at=now)
+
+    def record(self, user_id: str, **times: datetime) -> None:
+        fields = self.pending.get(user_id)
+        if fields is None:
+            if len(self.pending) >= self.max_size:
+                USER_ACTIVITY_UPDATES.labels('dropped').inc()
+                return
+            fields = self.pending[user_id] = {}
+
+        for field, at in times.items():
+            if field not in fields or fields[field] < at:
+                fields[field] = at
+
+    def restore(self, pending: dict[str, dict[str, datetime]]) -> None:
+        for user_id, fields in pending.items():
+            self.record(user_id, **fields)
+
+    # ****************************************
+    # Flush
+    # ****************************************
+    async def flush(self, mongo: MongoDBService) -> None:
+        if not self.pending:
+            return None
+
+        # Swap first: records made while the bulk write is in flight go to the next flush
+        pending, self.pending = self.pending, {}
+
+        # $max keeps the newest time when several workers flush the same user
+        operations = [UpdateOne({'_id': ObjectId(user_id)}, {MongoUpdateType.MAX.value: fields})
+                      for user_id, fields in pending.items()]
+        try:
+            report = await mongo.bulk_write(User, operations)
+        except asyncio.CancelledError:
+            # Cancelled at shutdown: the final flush writes the batch, $max makes partial re-writes harmless
+            self.restore(pending)
+            raise
+        except PyMongoError:
+            logger.exception('Cannot flush user activity of %d users, retrying with the next flush', len(operations))
+            self.restore(pending)
+            return None
+
+        USER_ACTIVITY_UPDATES.labels('flushed').inc(len(operations))
+
+        if report.errors:
+            logger.warning('Activity flush: %d of %d user updates failed, first error: %s',
+                           len(report.errors), len(operations), report.errors[0].message)
+
+    async def run(self, mongo: MongoDBService, interval: float = ACTIVITY_FLUSH_SECONDS) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush(mongo)
+
+
+activity_tracker = ActivityTracker()
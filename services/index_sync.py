@@ -0,0 +1,82 @@
+import asyncio
+from typing import Any
+
+from configs.logger import config_logging, logger
+from models.login_throttle import LoginThrottle
+from models.user import User
+from models.whitelist_token import WhiteListToken
+from schemas.base import MongoModel
+from services.mongodb import MongoDBService, mongodb_service
+
+MODELS: tuple[type[MongoModel], ...] = (User, WhiteListToken, LoginThrottle)
+
+# Options that make two indexes with the same keys different
+INDEX_OPTIONS = ('unique', 'expireAfterSeconds', 'sparse', 'partialFilterExpression')
+
+
+def index_options(spec: dict[str, Any]) -> dict[str, Any]:
+    # Explicit checks: expireAfterSeconds=0 is a real TTL and 0 == False
+    return {option: spec[option] for option in INDEX_OPTIONS
+            if spec.get(option) is not None and spec.get(option) is not False}
+
+
+def supports_sort(index_keys: list[tuple[str, Any]], sort_keys: list[tuple[str, int]]) -> bool:
+    # The sort must be a prefix of the index, walked either forwards or backwards
+    if len(sort_keys) > len(index_keys):
+        return False
+
+    prefix = index_keys[:len(sort_keys)]
+    if [field for field, _ in prefix] != [field for field, _ in sort_keys]:
+        return False
+
+    same = all(direction == sort_direction for (_, direction), (_, sort_direction) in zip(prefix, sort_keys))
+    reverse = all(direction == -sort_direction for (_, direction), (_, sort_direction) in zip(prefix, sort_keys))
+    return same or reverse
+
+
+async def sync_model_indexes(mongo: MongoDBService, model: type[MongoModel]) -> list[str]:
+    existing = {index['name']: index for index in await mongo.list_indexes(model)}
+    missing = []
+
+    for index in model.indexes:
+        spec = index.document
+        current = existing.get(spec['name'])
+
+        if current is None:
+            missing.append(index)
+        elif list(current['key'].items()) != list(spec['key'].items()) or index_options(current) != index_options(spec):
+            logger.warning('Index %s.%s differs from its declaration, rebuild it manually: %s != %s',
+                           model.get_mongodb_collection(), spec['name'], dict(current), spec)
+
+    created = await mongo.create_indexes(model, missing) if missing else []
+    for name in created:
+        logger.info('Created index %s.%s', model.get_mongodb_collection(), name)
+
+    # Sorts are issued with _id as tiebreaker, see MongoDBService.find_page
+    index_keys = [list(index.document['key'].items()) for index in model.indexes]
+    for field in model.allowed_order_fields:
+        if field == 'id':
+            continue
+        sort_keys = [(field, 1), ('_id', 1)]
+        if not any(supports_sort(keys, sort_keys) for keys in index_keys):
+            logger.warning('No index on %s supports ordering by %s', model.get_mongodb_collection(), field)
+
+    return created
+
+
+async def sync_indexes(mongo: MongoDBService, models: tuple[type[MongoModel], ...] = MODELS) -> None:
+    for model in models:
+        try:
+            await sync_model_indexes(mongo, model)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Cannot sync indexes of %s', model.get_mongodb_collection())
+
+
+async def main() -> None:
+    async with mongodb_service() as mongo:
+        await sync_indexes(mongo)
+
+
+if __name__ == '__main__':
+    config_logging()
+    asyncio.run(main())
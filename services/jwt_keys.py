@@ -0,0 +1,78 @@
+import asyncio
+from pathlib import Path
+from typing import Any
+
+from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_pem_public_key
+from jwt.algorithms import get_default_algorithms
+
+from configs.logger import logger
+from configs.settings import ALGORITHM, JWT_ACTIVE_KID, JWT_KEYS_DIR, JWT_KEYS_RELOAD_SECONDS
+from utils import json
+
+PRIVATE_SUFFIX = '.pem'
+PUBLIC_SUFFIX = '.pub.pem'
+
+
+class JWTKeyStore:
+    def __init__(self, keys_dir: Path = JWT_KEYS_DIR, algorithm: str = ALGORITHM,
+                 active_kid: str | None = JWT_ACTIVE_KID) -> None:
+        self.keys_dir = keys_dir
+        self.algorithm = algorithm
+        self.active_kid = active_kid
+
+        self.signing_kid: str | None = None
+        self.signing_key: Any = None
+        self.verify_keys: dict[str, Any] = {}
+        self.jwks_bytes = json.dumps({'keys': []})
+        self._mtime: float | None = None
+
+    @property
+    def is_asymmetric(self) -> bool:
+        return not self.algorithm.startswith('HS')
+
+    def load(self) -> None:
+        if not self.is_asymmetric:
+            return
+
+        signing_keys, verify_keys = {}, {}
+        for path in sorted(self.keys_dir.glob(f'*{PRIVATE_SUFFIX}')):
+            if path.name.endswith(PUBLIC_SUFFIX):
+                verify_keys[path.name.removesuffix(PUBLIC_SUFFIX)] = load_pem_public_key(path.read_bytes())
+            else:
+                kid = path.name.removesuffix(PRIVATE_SUFFIX)
+                signing_keys[kid] = load_pem_private_key(path.read_bytes(), password=None)
+                verify_keys[kid] = signing_keys[kid].public_key()
+
+        # Newest kid (by name, e.g. 2025-10-01) signs unless one is pinned
+        signing_kid = self.active_kid or (max(signing_keys) if signing_keys else None)
+        if signing_kid not in signing_keys:
+            raise FileNotFoundError(f'No private key for kid {signing_kid!r} in {self.keys_dir}')
+
+        algorithm = get_default_algorithms()[self.algorithm]
+        jwks = []
+        for kid, public_key in verify_keys.items():
+            jwk = algorithm.to_jwk(public_key, as_dict=True)
+            jwk.update({'kid': kid, 'alg': self.algorithm, 'use': 'sig'})
+            jwks.append(jwk)
+
+        self.signing_kid, self.signing_key = signing_kid, signing_keys[signing_kid]
+        self.verify_keys = verify_keys
+        self.jwks_bytes = json.dumps({'keys': jwks})
+        self._mtime = self.keys_dir.stat().st_mtime
+        logger.info('Loaded %d JWT keys, signing with kid %s', len(verify_keys), signing_kid)
+
+    def get_verify_key(self, kid: str | None) -> Any:
+        return self.verify_keys.get(kid) if kid else None
+
+    async def watch(self, interval: float = JWT_KEYS_RELOAD_SECONDS) -> None:
+        # Adding or removing key files changes the directory mtime
+        while self.is_asymmetric:
+            await asyncio.sleep(interval)
+            try:
+                if self.keys_dir.stat().st_mtime != self._mtime:
+                    self.load()
+            except (OSError, ValueError):
+                logger.exception('Cannot reload JWT keys from %s, keeping the current ones', self.keys_dir)
+
+
+jwt_keys = JWTKeyStore()
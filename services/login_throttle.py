@@ -0,0 +1,77 @@
+import asyncio
+import math
+import time
+from typing import ClassVar
+
+from fastapi import status
+
+import messages
+from configs.settings import (LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE, LOGIN_THROTTLE_CACHE_SIZE, LOGIN_THROTTLE_STORE,
+                              LOGIN_USER_BURST, LOGIN_USER_PER_MINUTE)
+from exceptions.api_exception import APIException
+from models.login_throttle import LoginThrottle
+from services.metrics import LOGIN_THROTTLED
+from services.mongodb import MongoDBService
+from services.password import PasswordService
+from utils.cache import TTLCache
+
+
+class LoginThrottleService:
+    # Per-worker buckets: key -> (tokens, monotonic time of the last update)
+    buckets: ClassVar[TTLCache[str, tuple[float, float]]] = TTLCache(maxsize=LOGIN_THROTTLE_CACHE_SIZE, ttl=0)
+
+    def __init__(self, mongo: MongoDBService, store: str = LOGIN_THROTTLE_STORE) -> None:
+        self.mongo = mongo
+        self.store = store
+
+    async def check(self, username: str, ip: str | None) -> None:
+        # Runs before the user lookup and bcrypt, a rejected attempt costs almost nothing
+        PasswordService.check_capacity()
+
+        if self.store == 'off':
+            return None
+
+        buckets = [(f'user:{username.lower()}', LOGIN_USER_BURST, LOGIN_USER_PER_MINUTE / 60)]
+        if ip:
+            buckets.append((f'ip:{ip}', LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE / 60))
+
+        retry_after = max(await asyncio.gather(*(self.take(*bucket) for bucket in buckets)))
+        if retry_after > 0:
+            LOGIN_THROTTLED.inc()
+            raise APIException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                               headers={'Retry-After': str(math.ceil(retry_after))},
+                               detail=messages.too_many_attempts, fields={'__all__': messages.too_many_attempts})
+
+    async def take(self, key: str, burst: int, rate: float) -> float:
+        # Takes one token, returns 0 when allowed or the seconds until a token is available
+        if self.store == 'mongo':
+            return await self.take_shared(key, burst, rate)
+        return self.take_local(key, burst, rate)
+
+    @classmethod
+    def take_local(cls, key: str, burst: int, rate: float) -> float:
+        now = time.monotonic()
+        tokens, updated_at = cls.buckets.get(key) or (float(burst), now)
+        tokens = min(float(burst), tokens + (now - updated_at) * rate)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        cls.buckets.set(key, (tokens, now), ttl=(burst - tokens) / rate)
+        return 0 if allowed else (1 - tokens) / rate
+
+    async def take_shared(self, key: str, burst: int, rate: float) -> float:
+        # Refill and take in one atomic update, times come from the server clock ($$NOW)
+        elapsed = {'$divide': [{'$subtract': ['$$NOW', {'$ifNull': ['$updated_at', '$$NOW']}]}, 1000]}
+        refilled = {'$min': [burst, {'$add': [{'$ifNull': ['$tokens', burst]}, {'$multiply': [elapsed, rate]}]}]}
+        pipeline = [
+            {'$set': {'tokens': refilled, 'updated_at': '$$NOW'}},
+            {'$set': {'allowed': {'$gte': ['$tokens', 1]}}},
+            {'$set': {'tokens': {'$cond': ['$allowed', {'$subtract': ['$tokens', 1]}, '$tokens']}}},
+            {'$set': {'expired': {'$add': ['$$NOW', {'$multiply': [{'$subtract': [burst, '$tokens']}, 1000 / rate]}]}}},
+        ]
+
+        bucket = await self.mongo.find_one_and_update(LoginThrottle, {'key': key}, pipeline, upsert=True)
+        if bucket is None or bucket.allowed:
+            return 0
+        return (1 - bucket.tokens) / rate
@@ -0,0 +1,129 @@
+import time
+from typing import Any, Callable, Coroutine
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from prometheus_client import Counter, Gauge, Histogram
+from pymongo import monitoring
+
+# Metrics live in prometheus_client objects (not plain attributes) so that with several workers
+# multiprocess mode (PROMETHEUS_MULTIPROC_DIR) can aggregate them; in-process gauges are summed over live workers
+LATENCY_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+
+HTTP_REQUEST_DURATION = Histogram('http_request_duration_seconds', 'HTTP request latency by route',
+                                  ['method', 'route', 'status'], buckets=LATENCY_BUCKETS)
+HTTP_REQUESTS_IN_FLIGHT = Gauge('http_requests_in_flight', 'HTTP requests being handled by route',
+                                ['method', 'route'], multiprocess_mode='livesum')
+
+MONGO_COMMAND_DURATION = Histogram('mongo_command_duration_seconds', 'MongoDB command latency',
+                                   ['command', 'status'], buckets=LATENCY_BUCKETS)
+MONGO_POOL_CHECKOUT_WAIT = Histogram('mongo_pool_checkout_wait_seconds', 'Time waited to check out a connection',
+                                     ['status'], buckets=LATENCY_BUCKETS)
+MONGO_POOL_CONNECTIONS = Gauge('mongo_pool_connections', 'Open MongoDB connections', multiprocess_mode='livesum')
+
+SLOW_QUERY_LABELS = ['collection', 'command', 'shape', 'sort']
+MONGO_SLOW_QUERIES = Counter('mongo_slow_queries', 'Slow MongoDB commands by query shape', SLOW_QUERY_LABELS)
+MONGO_SLOW_QUERY_DURATION = Counter('mongo_slow_query_duration_ms', 'Time spent in slow MongoDB commands',
+                                    SLOW_QUERY_LABELS)
+MONGO_SLOW_QUERY_PLAN = Gauge('mongo_slow_query_plan', 'Explained plan of a slow query shape',
+                              SLOW_QUERY_LABELS + ['collscan', 'blocking_sort'], multiprocess_mode='max')
+
+BCRYPT_OPERATIONS = Counter('bcrypt_operations', 'bcrypt executions', ['operation'])
+BCRYPT_PENDING = Gauge('bcrypt_pending', 'bcrypt jobs queued or running', multiprocess_mode='livesum')
+LOGIN_THROTTLED = Counter('login_throttled', 'Login attempts rejected by the rate limiter')
+JWT_OPERATIONS = Counter('jwt_operations', 'JWT encode/decode calls', ['operation'])
+
+USER_CACHE_LOOKUPS = Counter('user_cache_lookups', 'User cache lookups', ['result'])
+USER_CACHE_SIZE = Gauge('user_cache_size', 'Users held in the cache', multiprocess_mode='livesum')
+VERIFIED_TOKEN_CACHE_LOOKUPS = Counter('verified_token_cache_lookups', 'Verified access token cache lookups',
+                                       ['result'])
+VERIFIED_TOKEN_CACHE_SIZE = Gauge('verified_token_cache_size', 'Verified access tokens held in the cache',
+                                  multiprocess_mode='livesum')
+
+USER_ACTIVITY_UPDATES = Counter('user_activity_updates', 'Buffered last-seen/last-login updates', ['result'])
+USER_ACTIVITY_PENDING = Gauge('user_activity_pending', 'Users waiting for the next activity flush',
+                              multiprocess_mode='livesum')
+
+# Known label values are exported from the start (as 0) so rate() has a series before the first event
+for counter, values in ((BCRYPT_OPERATIONS, ('hash', 'verify', 'rejected')), (JWT_OPERATIONS, ('encode', 'decode')),
+                        (USER_CACHE_LOOKUPS, ('hit', 'miss')), (VERIFIED_TOKEN_CACHE_LOOKUPS, ('hit', 'miss')),
+                        (USER_ACTIVITY_UPDATES, ('flushed', 'dropped'))):
+    for value in values:
+        counter.labels(value)
+
+
+class MetricsRoute(APIRoute):
+    # Measured per route template (e.g. /users/{user_id}) so label cardinality stays bounded
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+        route = self.path
+
+        async def metrics_handler(request: Request) -> Response:
+            in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(request.method, route)
+            in_flight.inc()
+            status_code = 500
+            start = time.perf_counter()
+            try:
+                response = await handler(request)
+                status_code = response.status_code
+                return response
+            except HTTPException as exc:
+                status_code = exc.status_code
+                raise
+            except RequestValidationError:
+                # Turned into a 422 by the exception handler, not a server error
+                status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+                raise
+            finally:
+                in_flight.dec()
+                HTTP_REQUEST_DURATION.labels(request.method, route, str(status_code)).observe(
+                    time.perf_counter() - start)
+
+        return metrics_handler
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        MONGO_COMMAND_DURATION.labels(event.command_name, 'success').observe(event.duration_micros / 1e6)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        MONGO_COMMAND_DURATION.labels(event.command_name, 'failure').observe(event.duration_micros / 1e6)
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        MONGO_POOL_CHECKOUT_WAIT.labels('success').observe(event.duration or 0)
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        MONGO_POOL_CHECKOUT_WAIT.labels(str(event.reason)).observe(event.duration or 0)
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        MONGO_POOL_CONNECTIONS.inc()
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        MONGO_POOL_CONNECTIONS.dec()
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        pass
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        pass
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        pass
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent) -> None:
+        pass
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        pass
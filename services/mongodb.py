@@ -1,27 +1,73 @@
+import asyncio
+import base64
+import binascii
 from contextlib import asynccontextmanager
-from typing import Any, Literal, TypeVar
+from datetime import datetime
+from typing import Any, AsyncIterator, ClassVar, Literal, TypeVar
 
+import bson
 from bson import ObjectId
+from bson.errors import BSONError
 from fastapi import status
-from pymongo import ASCENDING, DESCENDING, AsyncMongoClient
+from pymongo import (ASCENDING, DESCENDING, AsyncMongoClient, DeleteMany, DeleteOne, IndexModel, InsertOne, UpdateMany,
+                     ReturnDocument, UpdateOne)
+from pymongo.asynchronous.change_stream import AsyncChangeStream
 from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.cursor import AsyncCursor
+from pymongo.errors import BulkWriteError
 from pymongo.server_api import ServerApi
 
 import messages
 from configs.logger import logger
-from configs.settings import DB_NAME, MONGO_URI
+from configs.settings import (DB_NAME, MONGO_BULK_BATCH_SIZE, MONGO_COUNT_CACHE_TTL, MONGO_MAX_POOL_SIZE,
+                              MONGO_MIN_POOL_SIZE, MONGO_URI, MONGO_WAIT_QUEUE_TIMEOUT_MS)
 from constants.mongo import MongoUpdateType
 from exceptions.api_exception import APIException
 from schemas.base import MongoModel
+from schemas.bulk_write import BulkWriteOpError, BulkWriteReport
+from services.metrics import CommandMetricsListener, PoolMetricsListener
+from services.slow_query import SlowQueryListener
+from utils.cache import TTLCache
+from utils.timezone import DEFAULT_TIMEZONE
 
 T = TypeVar('T', bound=MongoModel)
+# Types a sort key value may have in a pagination cursor
+CURSOR_VALUE_TYPES = (str, int, float, ObjectId, datetime)
+
+WriteOp = InsertOne | UpdateOne | UpdateMany | DeleteOne | DeleteMany
 
 
 class MongoDBService:
-    def __init__(self, mongo_uri: str = MONGO_URI, db_name: str = DB_NAME) -> None:
-        self.client = AsyncMongoClient(mongo_uri, server_api=ServerApi('1'))
+    count_cache: ClassVar[TTLCache[str, int]] = TTLCache(maxsize=1000, ttl=MONGO_COUNT_CACHE_TTL)
+
+    def __init__(self, mongo_uri: str = MONGO_URI, db_name: str = DB_NAME,
+                 client: AsyncMongoClient | None = None) -> None:
+        self.owns_client = client is None
+        self.slow_query_listener: SlowQueryListener | None = None
+
+        if client is None:
+            self.slow_query_listener = SlowQueryListener()
+            client = AsyncMongoClient(
+                mongo_uri,
+                server_api=ServerApi('1'),
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                # Stored as UTC, read back aware and in the API timezone like utils.timezone.now()
+                tz_aware=True,
+                tzinfo=DEFAULT_TIMEZONE,
+                event_listeners=[CommandMetricsListener(), PoolMetricsListener(), self.slow_query_listener],
+            )
+            # Explains of slow queries run on the same client
+            self.slow_query_listener.client = client
+
+        self.client = client
         self.db = self.client.get_database(db_name)
 
+    def view(self) -> 'MongoDBService':
+        # Shares this client (and its pool), closing the view is a no-op
+        return MongoDBService(db_name=self.db.name, client=self.client)
+
     async def ping(self) -> None:
         try:
             await self.client.admin.command('ping')
@@ -29,8 +75,15 @@ class MongoDBService:
         except Exception:
             logger.exception('Cannot connect to MongoDB with uri: %s', MONGO_URI)
 
+    async def warm_up(self, connections: int = MONGO_MIN_POOL_SIZE) -> None:
+        # Concurrent pings force the pool to open connections before the first request needs them
+        await self.ping()
+        await asyncio.gather(*(self.client.admin.command('ping') for _ in range(connections)),
+                             return_exceptions=True)
+
     async def close(self) -> None:
-        await self.client.close()
+        if self.owns_client:
+            await self.client.close()
 
     # ****************************************
     # Indexing
@@ -43,6 +96,14 @@ class MongoDBService:
         collection = self.__get_collection(model)
         return await collection.drop_index(name)
 
+    async def list_indexes(self, model: type[T]) -> list[dict[str, Any]]:
+        collection = self.__get_collection(model)
+        return [index async for index in await collection.list_indexes()]
+
+    async def create_indexes(self, model: type[T], indexes: list[IndexModel]) -> list[str]:
+        collection = self.__get_collection(model)
+        return await collection.create_indexes(indexes)
+
     # ****************************************
     # Insert
     # ****************************************
@@ -50,6 +111,7 @@ class MongoDBService:
         collection = self.__get_collection(obj.__class__)
         result = await collection.insert_one(obj.model_dump_mongo())
         obj.id = str(result.inserted_id)
+        obj.mark_clean()
 
     async def insert_objects(self, objs: list[MongoModel]) -> None:
         if not objs:
@@ -61,27 +123,116 @@ class MongoDBService:
         result = await collection.insert_many(docs)
         for model, inserted_id in zip(objs, result.inserted_ids):
             model.id = str(inserted_id)
+            model.mark_clean()
 
     # ****************************************
     # Find
     # ****************************************
-    async def find_one(self, model: type[T], **queries) -> T | None:
+    async def find_one(self, model: type[T], fields: list[str] | None = None, **queries) -> T | None:
         collection = self.__get_collection(model)
         queries = self.__clean_queries(queries)
-        doc = await collection.find_one(queries)
-        return model.model_validate(doc) if doc else None
+        projection = self.__convert_fields(model, fields)
+        doc = await collection.find_one(queries, projection)
+
+        if not doc:
+            return None
+        return model.model_construct_partial(doc, fields) if fields else model.model_validate(doc)
+
+    async def find_one_raw(self, model: type[T], fields: list[str] | None = None, **queries) -> dict[str, Any] | None:
+        # Trusted read: output fields straight from the decoded BSON, no model validation
+        fields = fields or model.get_output_fields()
+        collection = self.__get_collection(model)
+        queries = self.__clean_queries(queries)
+        doc = await collection.find_one(queries, self.__convert_fields(model, fields))
+        return model.mongo_to_output(doc, fields) if doc else None
 
     async def find_many(
-        self, model: type[T], limit: int = 10, offset: int = 0, order_by: str | None = None, **queries
+        self, model: type[T], limit: int = 10, offset: int = 0, order_by: str | None = None,
+        fields: list[str] | None = None, **queries
     ) -> list[T]:
+        objs, _ = await self.find_page(model, limit=limit, offset=offset, order_by=order_by, fields=fields, **queries)
+        return objs
+
+    async def find_page(
+        self, model: type[T], limit: int = 10, offset: int = 0, order_by: str | None = None,
+        cursor: str | None = None, fields: list[str] | None = None, **queries
+    ) -> tuple[list[T], str | None]:
+        docs, sort_params = self.__find_cursor(model, limit, offset, order_by, cursor, fields, queries)
+
+        objs, last_doc = [], None
+        async for doc in docs:
+            last_doc = doc
+            objs.append(model.model_construct_partial(doc, fields) if fields else model.model_validate(doc))
+
+        next_cursor = self.__encode_cursor(sort_params, last_doc) if limit and len(objs) == limit else None
+        return objs, next_cursor
+
+    async def find_page_raw(
+        self, model: type[T], limit: int = 10, offset: int = 0, order_by: str | None = None,
+        cursor: str | None = None, fields: list[str] | None = None, **queries
+    ) -> tuple[list[dict[str, Any]], str | None]:
+        # Trusted read: output fields straight from the decoded BSON, no model validation
+        fields = fields or model.get_output_fields()
+        docs, sort_params = self.__find_cursor(model, limit, offset, order_by, cursor, fields, queries)
+
+        outputs, last_doc = [], None
+        async for doc in docs:
+            last_doc = doc
+            outputs.append(model.mongo_to_output(doc, fields))
+
+        next_cursor = self.__encode_cursor(sort_params, last_doc) if limit and len(outputs) == limit else None
+        return outputs, next_cursor
+
+    def iter_raw(
+        self, model: type[T], order_by: str | None = None, fields: list[str] | None = None,
+        batch_size: int = 1000, **queries
+    ) -> AsyncIterator[dict[str, Any]]:
+        # The cursor is built eagerly so invalid order_by/fields fail before a response starts streaming
+        fields = fields or model.get_output_fields()
+        docs, _ = self.__find_cursor(model, 0, 0, order_by, None, fields, queries)
+        return self.__iter_outputs(model, docs.batch_size(batch_size), fields)
+
+    async def find_by_id(self, model: type[T], object_id: str, fields: list[str] | None = None) -> T | None:
+        return await self.find_one(model, fields=fields, _id=ObjectId(object_id))
+
+    async def find_by_id_raw(
+        self, model: type[T], object_id: str, fields: list[str] | None = None
+    ) -> dict[str, Any] | None:
+        return await self.find_one_raw(model, fields=fields, _id=ObjectId(object_id))
+
+    async def find_one_and_delete(self, model: type[T], **queries) -> T | None:
+        collection = self.__get_collection(model)
+        doc = await collection.find_one_and_delete(queries)
+        return model.model_validate(doc) if doc else None
+
+    async def find_one_and_update(self, model: type[T], queries: dict[str, Any],
+                                  update: dict[str, Any] | list[dict[str, Any]], upsert: bool = False) -> T | None:
+        # Returns the document after the update, update may be an aggregation pipeline
+        collection = self.__get_collection(model)
+        doc = await collection.find_one_and_update(queries, update, upsert=upsert,
+                                                   return_document=ReturnDocument.AFTER)
+        return model.model_validate(doc) if doc else None
+
+    # ****************************************
+    # Count
+    # ****************************************
+    async def count(self, model: type[T], exact: bool = False, **queries) -> int:
         collection = self.__get_collection(model)
         queries = self.__clean_queries(queries)
-        sort_params = self.__convert_order_by(model.allowed_order_fields, order_by)
-        docs = collection.find(queries).skip(offset).limit(limit).sort(sort_params)
-        return [model.model_validate(doc) async for doc in docs]
 
-    async def find_by_id(self, model: type[T], object_id: str) -> T | None:
-        return await self.find_one(model, _id=ObjectId(object_id))
+        if exact:
+            return await collection.count_documents(queries)
+
+        # Collection metadata, no scan
+        if not queries:
+            return await collection.estimated_document_count()
+
+        cache_key = f'{collection.name}:{bson.encode(queries).hex()}'
+        total = self.count_cache.get(cache_key)
+        if total is None:
+            total = await collection.count_documents(queries)
+            self.count_cache.set(cache_key, total)
+        return total
 
     # ****************************************
     # Update
@@ -96,8 +247,20 @@ class MongoDBService:
         collection = self.__get_collection(model)
         await collection.update_many(queries, {update_type.value: update_data})
 
-    async def update_object(self, obj: MongoModel) -> None:
-        await self.update_one(obj.__class__, queries={'_id': ObjectId(obj.id)}, **obj.model_dump_mongo())
+    async def update_object(self, obj: MongoModel, inc: dict[str, int] | None = None) -> None:
+        # Only fields changed since load are sent, nothing changed means no write at all
+        update_data = obj.model_dump_mongo_dirty()
+        if not update_data:
+            return None
+
+        # Counters in inc are incremented in the same atomic write
+        update: dict[str, Any] = {MongoUpdateType.SET.value: update_data}
+        if inc:
+            update[MongoUpdateType.INC.value] = inc
+
+        collection = self.__get_collection(obj.__class__)
+        await collection.update_one({'_id': ObjectId(obj.id)}, update)
+        obj.mark_clean()
 
     # ****************************************
     # Delete
@@ -113,6 +276,41 @@ class MongoDBService:
     async def delete_object(self, data: MongoModel):
         await self.delete_one(data.__class__, _id=ObjectId(data.id))
 
+    # ****************************************
+    # Bulk
+    # ****************************************
+    async def bulk_write(self, model: type[T], operations: list[WriteOp],
+                         batch_size: int = MONGO_BULK_BATCH_SIZE) -> BulkWriteReport:
+        collection = self.__get_collection(model)
+        report = BulkWriteReport()
+
+        for start in range(0, len(operations), batch_size):
+            try:
+                result = await collection.bulk_write(operations[start:start + batch_size], ordered=False)
+                details = result.bulk_api_result
+            except BulkWriteError as exc:
+                details = exc.details
+
+            report.inserted += details.get('nInserted', 0)
+            report.matched += details.get('nMatched', 0)
+            report.modified += details.get('nModified', 0)
+            report.deleted += details.get('nRemoved', 0)
+            report.upserted += details.get('nUpserted', 0)
+            report.errors += [
+                BulkWriteOpError(index=start + error['index'], code=error['code'], message=error['errmsg'])
+                for error in details.get('writeErrors', [])
+            ]
+
+        return report
+
+    # ****************************************
+    # Change stream
+    # ****************************************
+    async def watch(self, model: type[T], pipeline: list[dict[str, Any]] | None = None,
+                    **kwargs) -> AsyncChangeStream:
+        collection = self.__get_collection(model)
+        return await collection.watch(pipeline, **kwargs)
+
     # ****************************************
     # Utils
     # ****************************************
@@ -124,6 +322,34 @@ class MongoDBService:
     def __clean_queries(queries: dict):
         return {field: value for field, value in queries.items() if value}
 
+    @staticmethod
+    async def __iter_outputs(
+        model: type[MongoModel], docs: AsyncCursor, fields: list[str]
+    ) -> AsyncIterator[dict[str, Any]]:
+        async for doc in docs:
+            yield model.mongo_to_output(doc, fields)
+
+    def __find_cursor(
+        self, model: type[MongoModel], limit: int, offset: int, order_by: str | None, cursor: str | None,
+        fields: list[str] | None, queries: dict[str, Any]
+    ) -> tuple[AsyncCursor, list[tuple[str, Literal[1, -1]]]]:
+        collection = self.__get_collection(model)
+        queries = self.__clean_queries(queries)
+        sort_params = self.__convert_order_by(model.allowed_order_fields, order_by)
+
+        # _id as tiebreaker makes the order total, so a page boundary is a single key.
+        # It follows the last sort direction so a (field, _id) index can be walked either way.
+        if not any(field == '_id' for field, _ in sort_params):
+            sort_params.append(('_id', sort_params[-1][1] if sort_params else ASCENDING))
+
+        if cursor:
+            queries.update(self.__cursor_to_query(sort_params, cursor))
+            offset = 0
+
+        # Sort keys are fetched as well so the next cursor can be built
+        projection = self.__convert_fields(model, fields, extra=[field for field, _ in sort_params])
+        return collection.find(queries, projection).skip(offset).limit(limit).sort(sort_params), sort_params
+
     @staticmethod
     def __convert_order_by(
         allow_order: list | tuple | set, order_by: str | None = None, raise_exc: bool = True
@@ -155,6 +381,70 @@ class MongoDBService:
 
         return order_params
 
+    @staticmethod
+    def __convert_fields(
+        model: type[MongoModel], fields: list[str] | None = None, extra: list[str] | None = None
+    ) -> dict[str, int] | None:
+        if not fields:
+            return None
+
+        allow_fields = model.get_output_fields()
+        projection = {}
+
+        for field in fields:
+            if field not in allow_fields:
+                message = messages.not_allowed_field.format(field=field)
+                raise APIException(status_code=status.HTTP_400_BAD_REQUEST,
+                                   detail=message, fields={'fields': message})
+
+            # _id is always returned
+            if field != 'id':
+                projection[field] = 1
+
+        for field in extra or []:
+            if field != '_id':
+                projection[field] = 1
+
+        return projection or {'_id': 1}
+
+    @staticmethod
+    def __encode_cursor(sort_params: list[tuple[str, Literal[1, -1]]], doc: dict[str, Any] | None) -> str | None:
+        if doc is None:
+            return None
+
+        data = bson.encode({'s': sort_params, 'v': [doc.get(field) for field, _ in sort_params]})
+        return base64.urlsafe_b64encode(data).decode('ascii')
+
+    @staticmethod
+    def __cursor_to_query(sort_params: list[tuple[str, Literal[1, -1]]], cursor: str) -> dict[str, Any]:
+        try:
+            data = bson.decode(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (binascii.Error, BSONError, UnicodeEncodeError, ValueError):
+            data = {}
+
+        # Client supplied: the sort must be [field, ±1] pairs and values plain scalars (never query operators)
+        sort, values = data.get('s'), data.get('v')
+        valid = (
+            isinstance(sort, list) and isinstance(values, list) and len(values) == len(sort_params)
+            and all(isinstance(param, list) and len(param) == 2 and isinstance(param[0], str)
+                    and param[1] in (ASCENDING, DESCENDING) for param in sort)
+            and all(value is None or isinstance(value, CURSOR_VALUE_TYPES) for value in values)
+        )
+
+        # A cursor is only valid for the sort it was produced with
+        if not valid or [tuple(param) for param in sort] != sort_params:  # type: ignore
+            raise APIException(status_code=status.HTTP_400_BAD_REQUEST,
+                               detail=messages.cursor_invalid, fields={'cursor': messages.cursor_invalid})
+
+        # (a > x) or (a == x and b > y) or ...
+        conditions = []
+        for index, (field, direction) in enumerate(sort_params):
+            condition = {prev_field: value for (prev_field, _), value in zip(sort_params[:index], data['v'])}
+            condition[field] = {'$gt' if direction == ASCENDING else '$lt': data['v'][index]}
+            conditions.append(condition)
+
+        return {'$or': conditions}
+
 
 @asynccontextmanager
 async def mongodb_service():
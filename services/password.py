@@ -1,11 +1,36 @@
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, ClassVar, TypeVar
+
 import bcrypt
+from fastapi import status
+
+import messages
+from configs.logger import logger
+from configs.settings import BCRYPT_ROUNDS, BCRYPT_TARGET_MS, PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_WORKERS
+from exceptions.api_exception import APIException
+from services.metrics import BCRYPT_OPERATIONS, BCRYPT_PENDING
+
+R = TypeVar('R')
+
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+CALIBRATION_ROUNDS = 10
 
 
 class PasswordService:
-    @staticmethod
-    def hash_password(plain_password: str) -> str:
+    # bcrypt releases the GIL, so a thread pool keeps hashing off the event loop
+    executor: ClassVar[ThreadPoolExecutor | None] = None
+    rounds: ClassVar[int] = 12
+
+    pending: ClassVar[int] = 0
+
+    @classmethod
+    def hash_password(cls, plain_password: str) -> str:
         password_bytes = plain_password.encode('utf-8')
-        salt = bcrypt.gensalt()
+        salt = bcrypt.gensalt(rounds=cls.rounds)
         hashed = bcrypt.hashpw(password_bytes, salt)
         return hashed.decode('utf-8')
 
@@ -13,3 +38,95 @@ class PasswordService:
     def verify_password(plain_password: str, hashed_password: str) -> bool:
         password_bytes = plain_password.encode('utf-8')
         return bcrypt.checkpw(password_bytes, hashed_password.encode('utf-8'))
+
+    @classmethod
+    async def async_hash_password(cls, plain_password: str, wait: bool = False) -> str:
+        hashed = await cls.run_in_executor(cls.hash_password, plain_password, wait=wait)
+        BCRYPT_OPERATIONS.labels('hash').inc()
+        return hashed
+
+    @classmethod
+    async def async_hash_passwords(cls, plain_passwords: list[str]) -> list[str]:
+        # Background work (imports): waits for the pool instead of failing with 503 like interactive requests,
+        # one window per pool size so it never holds more than PASSWORD_HASH_WORKERS pending slots
+        hashed: list[str] = []
+        for start in range(0, len(plain_passwords), PASSWORD_HASH_WORKERS):
+            window = plain_passwords[start:start + PASSWORD_HASH_WORKERS]
+            hashed += await asyncio.gather(*(cls.async_hash_password(password, wait=True) for password in window))
+        return hashed
+
+    @classmethod
+    async def async_verify_password(cls, plain_password: str, hashed_password: str) -> bool:
+        verified = await cls.run_in_executor(cls.verify_password, plain_password, hashed_password)
+        BCRYPT_OPERATIONS.labels('verify').inc()
+        return verified
+
+    @classmethod
+    def get_rounds(cls, hashed_password: str) -> int | None:
+        # Hash format: $2b$<rounds>$<salt+hash>
+        try:
+            return int(hashed_password.split('$')[2])
+        except (IndexError, ValueError):
+            return None
+
+    @classmethod
+    def needs_rehash(cls, hashed_password: str) -> bool:
+        # Only upgrades: a worker configured with fewer rounds never weakens a stronger hash
+        rounds = cls.get_rounds(hashed_password)
+        return rounds is None or rounds < cls.rounds
+
+    # ****************************************
+    # Work factor
+    # ****************************************
+    @classmethod
+    def calibrate(cls, target_ms: int = BCRYPT_TARGET_MS) -> int:
+        start = time.perf_counter()
+        bcrypt.hashpw(b'calibration', bcrypt.gensalt(rounds=CALIBRATION_ROUNDS))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        # Every extra round doubles the hashing time
+        rounds = CALIBRATION_ROUNDS + math.floor(math.log2(target_ms / max(elapsed_ms, 1e-3)))
+        return min(max(rounds, MIN_ROUNDS), MAX_ROUNDS)
+
+    @classmethod
+    async def configure_rounds(cls, rounds: str = BCRYPT_ROUNDS) -> None:
+        if rounds == 'auto':
+            cls.rounds = await asyncio.get_running_loop().run_in_executor(cls.get_executor(), cls.calibrate)
+        else:
+            cls.rounds = int(rounds)
+        logger.info('Using %d bcrypt rounds', cls.rounds)
+
+    # ****************************************
+    # Executor
+    # ****************************************
+    @classmethod
+    def get_executor(cls) -> ThreadPoolExecutor:
+        if cls.executor is None:
+            cls.executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='bcrypt')
+        return cls.executor
+
+    @classmethod
+    def check_capacity(cls) -> None:
+        if cls.pending >= PASSWORD_HASH_MAX_PENDING:
+            BCRYPT_OPERATIONS.labels('rejected').inc()
+            raise APIException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'},
+                               detail=messages.server_busy, fields={'__all__': messages.server_busy})
+
+    @classmethod
+    async def run_in_executor(cls, func: Callable[..., R], *args: Any, wait: bool = False) -> R:
+        if not wait:
+            cls.check_capacity()
+
+        cls.pending += 1
+        BCRYPT_PENDING.inc()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(cls.get_executor(), func, *args)
+        finally:
+            cls.pending -= 1
+            BCRYPT_PENDING.dec()
+
+    @classmethod
+    def shutdown(cls) -> None:
+        if cls.executor is not None:
+            cls.executor.shutdown(wait=True)
+            cls.executor = None
@@ -0,0 +1,152 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any
+
+from pymongo import AsyncMongoClient, monitoring
+from pymongo.errors import PyMongoError
+
+from configs.logger import logger
+from configs.settings import MONGO_SLOW_QUERY_EXPLAIN, MONGO_SLOW_QUERY_MS
+from services.metrics import MONGO_SLOW_QUERIES, MONGO_SLOW_QUERY_DURATION, MONGO_SLOW_QUERY_PLAN
+from utils import json
+
+# Command name -> how to read its filter and sort
+EXPLAINABLE_COMMANDS = {
+    'find': lambda cmd: (cmd.get('filter', {}), cmd.get('sort')),
+    'count': lambda cmd: (cmd.get('query', {}), None),
+    'findAndModify': lambda cmd: (cmd.get('query', {}), cmd.get('sort')),
+    'update': lambda cmd: (cmd['updates'][0].get('q', {}) if cmd.get('updates') else {}, None),
+    'delete': lambda cmd: (cmd['deletes'][0].get('q', {}) if cmd.get('deletes') else {}, None),
+    'aggregate': lambda cmd: (cmd.get('pipeline', []), None),
+}
+
+MAX_PENDING_COMMANDS = 10000
+
+# Added by the driver to every command, not part of what gets explained
+COMMAND_ENVELOPE_FIELDS = ('lsid', 'txnNumber', 'apiVersion', 'apiStrict', 'apiDeprecationErrors')
+
+
+@dataclass
+class QueryShapeStats:
+    collection: str
+    command: str
+    shape: str
+    sort: str
+    count: int = 0
+    total_ms: float = 0
+    max_ms: float = 0
+    plan_stages: set[str] = field(default_factory=set)
+    explained: bool = False
+
+    @property
+    def collscan(self) -> bool:
+        return 'COLLSCAN' in self.plan_stages
+
+    @property
+    def blocking_sort(self) -> bool:
+        return 'SORT' in self.plan_stages
+
+    @property
+    def labels(self) -> tuple[str, str, str, str]:
+        return self.collection, self.command, self.shape, self.sort
+
+
+def redact(value: Any) -> Any:
+    # Keep operators and field names, drop the values
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, list) and any(isinstance(item, dict) for item in value):
+        return [redact(item) for item in value]
+    return '?'
+
+
+def plan_stages(plan: dict[str, Any]) -> set[str]:
+    stages = {plan['stage']} if 'stage' in plan else set()
+    for key in ('inputStage', 'queryPlan'):
+        if isinstance(plan.get(key), dict):
+            stages |= plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        stages |= plan_stages(child)
+    return stages
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    def __init__(self, threshold_ms: float = MONGO_SLOW_QUERY_MS, explain: bool = MONGO_SLOW_QUERY_EXPLAIN) -> None:
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.client: AsyncMongoClient | None = None
+
+        self.shapes: dict[str, QueryShapeStats] = {}
+        self._commands: dict[tuple[int, Any], tuple[str, dict[str, Any]]] = {}
+        # The loop only keeps weak references to tasks, these keep running explains alive
+        self._explain_tasks: set[asyncio.Task] = set()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name in EXPLAINABLE_COMMANDS and len(self._commands) < MAX_PENDING_COMMANDS:
+            self._commands[(event.request_id, event.connection_id)] = (event.database_name, event.command)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self.finished(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self.finished(event)
+
+    def finished(self, event: monitoring.CommandSucceededEvent | monitoring.CommandFailedEvent) -> None:
+        started = self._commands.pop((event.request_id, event.connection_id), None)
+        duration_ms = event.duration_micros / 1000
+        if started is None or duration_ms < self.threshold_ms:
+            return
+
+        database_name, command = started
+        self.record(database_name, event.command_name, command, duration_ms)
+
+    def record(self, database_name: str, command_name: str, command: dict[str, Any], duration_ms: float) -> None:
+        collection = command.get(command_name)
+        query, sort = EXPLAINABLE_COMMANDS[command_name](command)
+        shape = json.dumps(redact(query)).decode()
+        sort_shape = json.dumps(sort).decode() if sort else ''
+        key = f'{collection}|{command_name}|{shape}|{sort_shape}'
+
+        stats = self.shapes.get(key)
+        if stats is None:
+            stats = self.shapes[key] = QueryShapeStats(collection=str(collection), command=command_name,
+                                                       shape=shape, sort=sort_shape)
+        stats.count += 1
+        stats.total_ms += duration_ms
+        stats.max_ms = max(stats.max_ms, duration_ms)
+        MONGO_SLOW_QUERIES.labels(*stats.labels).inc()
+        MONGO_SLOW_QUERY_DURATION.labels(*stats.labels).inc(duration_ms)
+
+        logger.warning('Slow MongoDB %s on %s took %.1fms: filter=%s sort=%s',
+                       command_name, collection, duration_ms, shape, sort_shape or '-')
+
+        # One explain per shape is enough to know its plan
+        if self.explain and not stats.explained and self.client is not None and command_name in ('find', 'count'):
+            stats.explained = True
+            try:
+                task = asyncio.get_running_loop().create_task(
+                    self.explain_plan(stats, database_name, command_name, command))
+            except RuntimeError:
+                stats.explained = False
+                return
+            self._explain_tasks.add(task)
+            task.add_done_callback(self._explain_tasks.discard)
+
+    async def explain_plan(self, stats: QueryShapeStats, database_name: str, command_name: str,
+                           command: dict[str, Any]) -> None:
+        explain_command = {key: value for key, value in command.items()
+                           if not key.startswith('$') and key not in COMMAND_ENVELOPE_FIELDS}
+        try:
+            result = await self.client.get_database(database_name).command(  # type: ignore
+                {'explain': explain_command, 'verbosity': 'queryPlanner'})
+        except PyMongoError:
+            logger.exception('Cannot explain slow MongoDB %s on %s', command_name, stats.collection)
+            return
+
+        stats.plan_stages = plan_stages(result.get('queryPlanner', {}).get('winningPlan', {}))
+        plan_labels = (str(stats.collscan).lower(), str(stats.blocking_sort).lower())
+        MONGO_SLOW_QUERY_PLAN.labels(*stats.labels, *plan_labels).set(1)
+        if stats.collscan or stats.blocking_sort:
+            logger.warning('Slow MongoDB %s on %s has no supporting index (%s): filter=%s sort=%s', command_name,
+                           stats.collection, ', '.join(sorted(stats.plan_stages & {'COLLSCAN', 'SORT'})),
+                           stats.shape, stats.sort or '-')
@@ -1,35 +1,62 @@
-import json
-import uuid
+import hashlib
+from calendar import timegm
 from datetime import datetime
-from typing import Any
+from typing import Any, ClassVar
 
 import jwt
 from bson import ObjectId
 from pydantic import BaseModel
 
-from configs.settings import ALGORITHM, SECRET_KEY
+from configs.settings import ALGORITHM, SECRET_KEY, VERIFIED_TOKEN_CACHE_SIZE, WHITELIST_MIRROR
+from constants.mongo import MongoUpdateType
+from constants.token_type import TokenType
 from models.user import User
 from models.whitelist_token import WhiteListToken
 from schemas.token import Token, TokenPayload, TokenResponse
+from services.jwt_keys import JWTKeyStore, jwt_keys
+from services.metrics import JWT_OPERATIONS, VERIFIED_TOKEN_CACHE_LOOKUPS
 from services.mongodb import MongoDBService
+from services.user import UserService
+from services.whitelist_mirror import whitelist_mirror
+from utils import json, timezone
+from utils.cache import TTLCache
+
+TIME_CLAIMS = ('exp', 'iat', 'nbf')
 
 
 class JWTService:
-    class Encoder(json.JSONEncoder):
-        def default(self, o):
-            if isinstance(o, (uuid.UUID, ObjectId)):
-                return str(o)
-            return super().default(o)
+    # Token digest -> validated access payload, each entry lives until the token's exp
+    verified: ClassVar[TTLCache[bytes, TokenPayload]] = TTLCache(maxsize=VERIFIED_TOKEN_CACHE_SIZE, ttl=0)
 
-    def __init__(self, secret_key: str = SECRET_KEY, algorithm: str = ALGORITHM) -> None:
+    def __init__(self, secret_key: str = SECRET_KEY, algorithm: str = ALGORITHM,
+                 key_store: JWTKeyStore = jwt_keys) -> None:
         self.secret_key = secret_key
         self.algorithm = algorithm
+        self.key_store = key_store
 
     def encode(self, data: dict[str, Any] | BaseModel) -> str:
         to_encode = data.model_dump(exclude_none=True) if isinstance(data, BaseModel) else data.copy()
-        return jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm, json_encoder=self.Encoder)
+
+        # Same as jwt.encode: time claims become integer timestamps
+        for claim in TIME_CLAIMS:
+            if isinstance(to_encode.get(claim), datetime):
+                to_encode[claim] = timegm(to_encode[claim].utctimetuple())
+
+        # Payload serialized with orjson, PyJWS only signs the bytes
+        JWT_OPERATIONS.labels('encode').inc()
+        if self.key_store.is_asymmetric:
+            return jwt.api_jws.encode(json.dumps(to_encode), self.key_store.signing_key, algorithm=self.algorithm,
+                                      headers={'kid': self.key_store.signing_kid})
+        return jwt.api_jws.encode(json.dumps(to_encode), self.secret_key, algorithm=self.algorithm)
 
     def decode(self, token: str) -> dict[str, Any]:
+        JWT_OPERATIONS.labels('decode').inc()
+        if self.key_store.is_asymmetric:
+            kid = jwt.get_unverified_header(token).get('kid')
+            key = self.key_store.get_verify_key(kid)
+            if key is None:
+                raise jwt.InvalidSignatureError(f'Unknown key id: {kid}')
+            return jwt.decode(token, key, algorithms=[self.algorithm])
         return jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
 
 
@@ -55,19 +82,49 @@ class TokenService(JWTService):
         return TokenResponse(access=access, refresh=refresh)
 
     async def decode_payload(self, token: str) -> TokenPayload:
-        payload = self.decode(token)
-        return TokenPayload.model_validate(payload)
-
-    async def is_revoked(self, jti: str) -> bool:
-        return await self.mongo.find_one(WhiteListToken, jti=jti) is None
+        # Only a token that already passed the signature check can be in the cache
+        digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        token_payload = self.verified.get(digest)
+        if token_payload is not None:
+            VERIFIED_TOKEN_CACHE_LOOKUPS.labels('hit').inc()
+            return token_payload
+        VERIFIED_TOKEN_CACHE_LOOKUPS.labels('miss').inc()
+
+        token_payload = TokenPayload.model_validate(self.decode(token))
+
+        # Refresh tokens are used once, caching them would only evict access tokens
+        ttl = (token_payload.exp - timezone.now()).total_seconds()
+        if token_payload.type == TokenType.ACCESS and ttl > 0:
+            self.verified.set(digest, token_payload, ttl=ttl)
+        return token_payload
+
+    def is_known_revoked(self, jti: str, issued_at: datetime) -> bool:
+        # Answered from the local mirror only, False means "ask the database"
+        return WHITELIST_MIRROR and whitelist_mirror.lookup(jti=jti, issued_at=issued_at) is False
+
+    async def consume_refresh(self, jti: str) -> WhiteListToken | None:
+        # Atomic: of two concurrent refreshes with the same token only one gets the entry back
+        whitelist_token = await self.mongo.find_one_and_delete(WhiteListToken, jti=jti)
+        if WHITELIST_MIRROR:
+            whitelist_mirror.discard(jti)
+        return whitelist_token
 
     async def set_to_whitelist(self, jti: str, user_id: str, expired: datetime) -> WhiteListToken:
         whitelist_token = WhiteListToken(jti=jti, user_id=user_id, expired=expired)
         await self.mongo.insert_object(whitelist_token)
+        if WHITELIST_MIRROR:
+            whitelist_mirror.add(whitelist_token)
         return whitelist_token
 
     async def revoke(self, jti: str) -> None:
         await self.mongo.delete_one(WhiteListToken, jti=jti)
+        if WHITELIST_MIRROR:
+            whitelist_mirror.discard(jti)
 
     async def revoke_all(self, user_id: str) -> None:
         await self.mongo.delete_many(WhiteListToken, _user_id=ObjectId(user_id))
+
+        # Invalidates stateless access tokens issued before now
+        await self.mongo.update_one(User, queries={'_id': ObjectId(user_id)},
+                                    update_type=MongoUpdateType.INC, token_epoch=1)
+        UserService.evict(user_id)
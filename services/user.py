@@ -1,15 +1,60 @@
-from typing import Any
+import asyncio
+from typing import Any, AsyncIterator, ClassVar
 
-from models.user import User
+from bson import ObjectId
+from fastapi import status
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
+
+import messages
+from configs.logger import logger
+from configs.settings import (EXPORT_BATCH_SIZE, TOKEN_EPOCH_CACHE_TTL, USER_BULK_CHUNK_SIZE, USER_CACHE_SIZE,
+                              USER_CACHE_TTL)
+from exceptions.api_exception import APIException
+from models.user import ACTIVITY_FIELDS, User
+from models.whitelist_token import WhiteListToken
+from schemas.bulk_write import BulkWriteReport
+from services.metrics import USER_CACHE_LOOKUPS
 from services.mongodb import MongoDBService
+from services.password import PasswordService
+from utils.cache import TTLCache
+
+WATCH_RETRY_SECONDS = 5
+
+# Carried as claims by stateless access tokens, changing one must invalidate them
+TOKEN_CLAIM_FIELDS = {'username', 'role'}
 
 
 class UserService:
+    # Shared by every request of this worker
+    cache: ClassVar[TTLCache[str, User]] = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+    token_epochs: ClassVar[TTLCache[str, int]] = TTLCache(maxsize=USER_CACHE_SIZE, ttl=TOKEN_EPOCH_CACHE_TTL)
+
     def __init__(self, mongo: MongoDBService) -> None:
         self.mongo = mongo
 
     async def get_by_id(self, user_id: str) -> User | None:
-        return await self.mongo.find_by_id(User, user_id)
+        user = self.cache.get(user_id)
+        USER_CACHE_LOOKUPS.labels('miss' if user is None else 'hit').inc()
+        if user is None:
+            user = await self.mongo.find_by_id(User, user_id)
+            if user is None:
+                return None
+            self.cache.set(user_id, user)
+        return user.model_copy()
+
+    async def get_token_epoch(self, user_id: str) -> int | None:
+        token_epoch = self.token_epochs.get(user_id)
+        if token_epoch is None:
+            user = await self.get_by_id(user_id)
+            if user is None:
+                return None
+            token_epoch = user.token_epoch
+            self.token_epochs.set(user_id, token_epoch)
+        return token_epoch
+
+    async def get_by_id_raw(self, user_id: str, fields: list[str] | None = None) -> dict[str, Any] | None:
+        return await self.mongo.find_by_id_raw(User, user_id, fields=fields)
 
     async def get_by_username(self, username: str) -> User | None:
         return await self.mongo.find_one(User, username=username)
@@ -18,7 +63,7 @@ class UserService:
         return True
 
     async def verify_password(self, user: User, password: str) -> bool:
-        return user.verify(plain_password=password)
+        return await user.verify(plain_password=password)
 
     async def is_exist_id(self, user_id: str) -> bool:
         user = await self.get_by_id(user_id)
@@ -31,21 +76,128 @@ class UserService:
     async def get_list(self, limit: int, offset: int, order_by: str | None = None) -> list[User]:
         return await self.mongo.find_many(User, limit=limit, offset=offset, order_by=order_by)
 
+    async def get_page_raw(self, limit: int, offset: int, order_by: str | None = None, cursor: str | None = None,
+                           fields: list[str] | None = None) -> tuple[list[dict[str, Any]], str | None]:
+        return await self.mongo.find_page_raw(User, limit=limit, offset=offset, order_by=order_by, cursor=cursor,
+                                              fields=fields)
+
+    async def count(self, exact: bool = False) -> int:
+        return await self.mongo.count(User, exact=exact)
+
+    def export(self, order_by: str | None = None, fields: list[str] | None = None) -> AsyncIterator[dict[str, Any]]:
+        return self.mongo.iter_raw(User, order_by=order_by, fields=fields, batch_size=EXPORT_BATCH_SIZE)
+
     async def create(self, username: str, password: str) -> User:
         user = User(username=username)
-        user.set_password(plain_password=password)
-        await self.mongo.insert_object(user)
+        await user.set_password(plain_password=password)
+
+        # Uniqueness is enforced by username_index
+        try:
+            await self.mongo.insert_object(user)
+        except DuplicateKeyError as exc:
+            raise APIException(status_code=status.HTTP_409_CONFLICT,
+                               detail=messages.user_exists, fields={'username': messages.user_exists}) from exc
         return user
 
+    async def bulk_create(self, credentials: list[tuple[str, str]], upsert: bool = False) -> BulkWriteReport:
+        # Each chunk is written as soon as it is hashed: a failure later on keeps what is already imported
+        report = BulkWriteReport()
+        for start in range(0, len(credentials), USER_BULK_CHUNK_SIZE):
+            chunk_report = await self.bulk_create_chunk(credentials[start:start + USER_BULK_CHUNK_SIZE], upsert)
+            report.merge(chunk_report, offset=start)
+        return report
+
+    async def bulk_create_chunk(self, credentials: list[tuple[str, str]], upsert: bool) -> BulkWriteReport:
+        hashed_passwords = await PasswordService.async_hash_passwords([password for _, password in credentials])
+
+        operations: list[InsertOne | UpdateOne] = []
+        for (username, _), hashed_password in zip(credentials, hashed_passwords):
+            user = User(username=username, password=hashed_password)
+            if upsert:
+                data = user.model_dump_mongo()
+                password = data.pop('password')
+                # A password reset ends existing sessions: the epoch bump invalidates stateless access tokens
+                operations.append(UpdateOne({'username': username},
+                                            {'$set': {'password': password}, '$inc': {'token_epoch': 1},
+                                             '$setOnInsert': data}, upsert=True))
+            else:
+                operations.append(InsertOne(user.model_dump_mongo()))
+
+        report = await self.mongo.bulk_write(User, operations)
+        if upsert:
+            await self.revoke_refresh_tokens([username for username, _ in credentials])
+            # Existing users may have a new password hash and token epoch
+            self.cache.clear()
+            self.token_epochs.clear()
+        return report
+
+    async def revoke_refresh_tokens(self, usernames: list[str]) -> None:
+        # Looked up after the write: a login racing the import already needed the new password
+        users = await self.mongo.find_many(User, limit=0, fields=['id'], username={'$in': usernames})
+        if users:
+            await self.mongo.delete_many(WhiteListToken, _user_id={'$in': [ObjectId(user.id) for user in users]})
+
     async def update(self, user: User, update_data: dict[str, Any]) -> User:
         user = user.model_copy(update=update_data)
-        await self.mongo.update_object(user)
+
+        # Bumping the epoch rejects access tokens that still carry the old username or role
+        inc = {'token_epoch': 1} if user.get_dirty_fields() & TOKEN_CLAIM_FIELDS else None
+
+        try:
+            await self.mongo.update_object(user, inc=inc)
+        except DuplicateKeyError as exc:
+            raise APIException(status_code=status.HTTP_409_CONFLICT,
+                               detail=messages.user_exists, fields={'username': messages.user_exists}) from exc
+        self.evict(user.id)
         return user
 
     async def update_password(self, user: User, new_password: str) -> User:
-        user.set_password(plain_password=new_password)
+        await user.set_password(plain_password=new_password)
         await self.mongo.update_object(user)
+        self.evict(user.id)
         return user
 
+    async def rehash_password(self, user: User, password: str) -> None:
+        # Runs after login to move the stored hash to the current work factor
+        try:
+            await self.update_password(user, new_password=password)
+        except APIException:
+            logger.warning('Skip rehashing password of user %s: password hashing pool is busy', user.id)
+
     async def delete(self, user: User):
         await self.mongo.delete_object(user)
+        self.evict(user.id)
+
+    # ****************************************
+    # Cross-worker invalidation
+    # ****************************************
+    @classmethod
+    def evict(cls, user_id: str) -> None:
+        cls.cache.delete(user_id)
+        cls.token_epochs.delete(user_id)
+
+    @classmethod
+    async def watch_changes(cls, mongo: MongoDBService) -> None:
+        # Activity flushes only touch last_*_at, evicting on them would empty every worker's cache each flush
+        updated = {'$objectToArray': {'$ifNull': ['$updateDescription.updatedFields', {}]}}
+        updated_fields = {'$map': {'input': updated, 'in': '$$this.k'}}
+        activity_only = {'$and': [{'$eq': ['$operationType', 'update']},
+                                  {'$setIsSubset': [updated_fields, list(ACTIVITY_FIELDS)]},
+                                  {'$eq': [{'$size': {'$ifNull': ['$updateDescription.removedFields', []]}}, 0]}]}
+        pipeline = [{'$match': {'operationType': {'$in': ['update', 'replace', 'delete']},
+                                '$expr': {'$not': [activity_only]}}}]
+
+        while True:
+            try:
+                async with await mongo.watch(User, pipeline) as stream:
+                    # Changes may have been missed while the stream was down
+                    cls.cache.clear()
+                    cls.token_epochs.clear()
+                    async for change in stream:
+                        cls.evict(str(change['documentKey']['_id']))
+            except OperationFailure:
+                logger.warning('Change streams are not supported, user cache relies on TTL only')
+                return
+            except PyMongoError:
+                logger.exception('User change stream interrupted, retrying in %ds', WATCH_RETRY_SECONDS)
+                await asyncio.sleep(WATCH_RETRY_SECONDS)
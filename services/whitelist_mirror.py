@@ -0,0 +1,128 @@
+import asyncio
+import time
+from datetime import datetime
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from configs.logger import logger
+from configs.settings import WHITELIST_MIRROR_MAX_LAG
+from models.whitelist_token import WhiteListToken
+from services.mongodb import MongoDBService
+
+BUCKET_SECONDS = 60
+WATCH_MAX_AWAIT_MS = 1000
+WATCH_RETRY_SECONDS = 5
+
+# A refresh token is encoded slightly before its whitelist entry is written
+ISSUE_MARGIN_SECONDS = 1
+
+
+class WhiteListMirror:
+    def __init__(self, max_lag: float = WHITELIST_MIRROR_MAX_LAG) -> None:
+        self.max_lag = max_lag
+        self.synced_at: float | None = None
+
+        # jti -> (expiry bucket, document id), buckets let expired entries be dropped wholesale
+        self.jtis: dict[str, tuple[int, str]] = {}
+        self.ids: dict[str, str] = {}
+        self.buckets: dict[int, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.jtis)
+
+    # ****************************************
+    # Lookup
+    # ****************************************
+    def lookup(self, jti: str, issued_at: datetime) -> bool | None:
+        # True/False when the mirror can answer, None when the caller must ask the database
+        self.prune()
+
+        if jti in self.jtis:
+            return True
+
+        if not self.is_fresh() or issued_at.timestamp() > self.synced_at - ISSUE_MARGIN_SECONDS:  # type: ignore
+            return None
+        return False
+
+    def is_fresh(self) -> bool:
+        return self.synced_at is not None and time.time() - self.synced_at <= self.max_lag
+
+    # ****************************************
+    # Mutation
+    # ****************************************
+    def add(self, token: WhiteListToken) -> None:
+        bucket = int(token.expired.timestamp()) // BUCKET_SECONDS
+        self.jtis[token.jti] = (bucket, token.id)
+        self.ids[token.id] = token.jti
+        self.buckets.setdefault(bucket, set()).add(token.jti)
+
+    def discard(self, jti: str) -> None:
+        entry = self.jtis.pop(jti, None)
+        if entry is None:
+            return
+
+        bucket, token_id = entry
+        self.ids.pop(token_id, None)
+        if bucket in self.buckets:
+            self.buckets[bucket].discard(jti)
+
+    def discard_id(self, token_id: str) -> None:
+        jti = self.ids.get(token_id)
+        if jti is not None:
+            self.discard(jti)
+
+    def prune(self) -> None:
+        current = int(time.time()) // BUCKET_SECONDS
+        for bucket in [bucket for bucket in self.buckets if bucket < current]:
+            for jti in self.buckets.pop(bucket):
+                entry = self.jtis.pop(jti, None)
+                if entry is not None:
+                    self.ids.pop(entry[1], None)
+
+    def reset(self) -> None:
+        self.synced_at = None
+        self.jtis.clear()
+        self.ids.clear()
+        self.buckets.clear()
+
+    # ****************************************
+    # Sync
+    # ****************************************
+    async def run(self, mongo: MongoDBService) -> None:
+        pipeline = [{'$match': {'operationType': {'$in': ['insert', 'delete']}}}]
+
+        while True:
+            try:
+                # Open the stream before loading so that no write falls between the two
+                async with await mongo.watch(WhiteListToken, pipeline, max_await_time_ms=WATCH_MAX_AWAIT_MS) as stream:
+                    self.reset()
+                    for token in await mongo.find_many(WhiteListToken, limit=0):
+                        self.add(token)
+                    logger.info('Loaded %d whitelist tokens into the mirror', len(self))
+
+                    while stream.alive:
+                        polled_at = time.time()
+                        change = await stream.try_next()
+                        if change is not None:
+                            self.apply(change)
+                        else:
+                            # Caught up: every write made before the poll started has been applied.
+                            # While working through a backlog the mirror stays stale and lookups go to the database.
+                            self.synced_at = polled_at
+            except OperationFailure:
+                logger.warning('Change streams are not supported, whitelist mirror disabled')
+                self.reset()
+                return
+            except PyMongoError:
+                logger.exception('Whitelist change stream interrupted, retrying in %ds', WATCH_RETRY_SECONDS)
+                self.reset()
+                await asyncio.sleep(WATCH_RETRY_SECONDS)
+
+    def apply(self, change: dict) -> None:
+        if change['operationType'] == 'insert':
+            self.add(WhiteListToken.model_validate(change['fullDocument']))
+        else:
+            self.discard_id(str(change['documentKey']['_id']))
+
+
+whitelist_mirror = WhiteListMirror()
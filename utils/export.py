@@ -0,0 +1,46 @@
+import csv
+import io
+from typing import Any, AsyncIterator
+
+from constants.export_format import ExportFormat
+from utils import json
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: 'application/x-ndjson',
+    ExportFormat.CSV: 'text/csv',
+}
+
+
+async def ndjson_chunks(rows: AsyncIterator[dict[str, Any]], chunk_size: int) -> AsyncIterator[bytes]:
+    chunk: list[bytes] = []
+    async for row in rows:
+        chunk.append(json.dumps(row))
+        if len(chunk) >= chunk_size:
+            yield b'\n'.join(chunk) + b'\n'
+            chunk = []
+    if chunk:
+        yield b'\n'.join(chunk) + b'\n'
+
+
+async def csv_chunks(rows: AsyncIterator[dict[str, Any]], fields: list[str], chunk_size: int) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+
+    count = 0
+    async for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_chunks(
+    rows: AsyncIterator[dict[str, Any]], export_format: ExportFormat, fields: list[str], chunk_size: int
+) -> AsyncIterator[bytes] | AsyncIterator[str]:
+    if export_format == ExportFormat.CSV:
+        return csv_chunks(rows, fields, chunk_size)
+    return ndjson_chunks(rows, chunk_size)
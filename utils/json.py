@@ -0,0 +1,18 @@
+from typing import Any
+
+import orjson
+from bson import ObjectId
+
+
+def default(obj: Any) -> Any:
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f'Object of type {obj.__class__.__name__} is not JSON serializable')
+
+
+def dumps(data: Any) -> bytes:
+    return orjson.dumps(data, default=default)
+
+
+def loads(data: bytes | str) -> Any:
+    return orjson.loads(data)
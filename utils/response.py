@@ -0,0 +1,6 @@
+from starlette.responses import Response
+
+
+class RawJSONResponse(Response):
+    # Content is already serialized JSON bytes
+    media_type = 'application/json'